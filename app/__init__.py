@@ -3,12 +3,18 @@ from config import Config
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
+from app.cache import create_cache
+from app.passwords import PasswordHasher
+from app.replicas import RoutingSession
 
 app = Flask(__name__)
 app.config.from_object(Config)
-db = SQLAlchemy(app)
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
 migrate = Migrate(app, db)
 login = LoginManager(app)
 login.login_view = 'login'
+render_cache = create_cache(app.config['CACHE_BACKEND'], app.config['RENDER_CACHE_SIZE'])
+user_cache = create_cache(app.config['CACHE_BACKEND'], app.config['USER_CACHE_SIZE'])
+password_hasher = PasswordHasher(app.config['PASSWORD_HASH_METHOD'], app.config['PASSWORD_HASH_WORKERS'])
 
-from app import routes, models, errors
+from app import database, metrics, routes, models, errors, tasks
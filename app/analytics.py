@@ -0,0 +1,173 @@
+import numpy as np
+import sqlalchemy as sa
+from datetime import datetime, timezone
+from app import db
+from app.models import Exercise, Progression, ProgressionSummary
+from app.units import UNIT_FACTORS
+
+WEEK = 7 * 24 * 3600
+# The Unix epoch is a Thursday; shift so weekly buckets start on Monday
+WEEK_OFFSET = 4 * 24 * 3600
+
+
+def epley(weights, reps):
+    return np.where(reps == 1, weights, weights * (1 + reps / 30))
+
+
+def brzycki(weights, reps):
+    # Undefined from 37 reps on, where the denominator reaches zero
+    return np.where(reps < 37, weights * 36 / np.maximum(37 - reps, 1), np.nan)
+
+
+FORMULAS = {'epley': epley, 'brzycki': brzycki}
+
+
+def load_columns(query):
+    rows = db.session.execute(query).all()
+    if not rows:
+        return None
+    exercise_ids, dates, *values = zip(*rows)
+    timestamps = np.fromiter(
+        ((date if date.tzinfo else date.replace(tzinfo=timezone.utc)).timestamp() for date in dates),
+        dtype=np.float64, count=len(rows)
+    )
+    return (np.asarray(exercise_ids, dtype=np.int64), timestamps) + tuple(np.asarray(v, dtype=np.float64) for v in values)
+
+
+def progressions_query(user_id, exercise_id=None):
+    query = (
+        sa.select(Progression.exercise_id, Progression.date, Progression.weight, Progression.rep)
+        .join(Progression.exercise)
+        .where(Exercise.user_id == user_id, Exercise.deleting.is_(False))
+        .order_by(Progression.date, Progression.id)
+    )
+    if exercise_id is not None:
+        query = query.where(Progression.exercise_id == exercise_id)
+    return query
+
+
+def summaries_query(user_id, exercise_id=None):
+    query = (
+        sa.select(
+            ProgressionSummary.exercise_id, ProgressionSummary.week_start, ProgressionSummary.best_weight,
+            ProgressionSummary.best_rep, ProgressionSummary.volume, ProgressionSummary.set_count
+        )
+        .join(Exercise, Exercise.id == ProgressionSummary.exercise_id)
+        .where(Exercise.user_id == user_id, Exercise.deleting.is_(False))
+    )
+    if exercise_id is not None:
+        query = query.where(ProgressionSummary.exercise_id == exercise_id)
+    return query
+
+
+def load_history(user_id, exercise_id=None):
+    # Recent sets plus archived weeks, each week standing in as its best set with the week's full volume and set count
+    parts = []
+    weeks = load_columns(summaries_query(user_id, exercise_id))
+    if weeks is not None:
+        parts.append(weeks)
+    sets = load_columns(progressions_query(user_id, exercise_id))
+    if sets is not None:
+        exercise_ids, timestamps, weights, reps = sets
+        parts.append((exercise_ids, timestamps, weights, reps, weights * reps, np.ones(len(reps))))
+    if not parts:
+        return None
+    columns = [np.concatenate(column) for column in zip(*parts)]
+    order = np.argsort(columns[1], kind='stable')
+    return tuple(column[order] for column in columns)
+
+
+def isoformat(timestamps):
+    return [datetime.fromtimestamp(t, timezone.utc).isoformat() for t in timestamps]
+
+
+def rounded(values):
+    return [None if np.isnan(v) else v for v in np.round(values, 2).tolist()]
+
+
+def bucket_starts(n, max_points):
+    # Start index of each of max_points contiguous buckets covering n points
+    buckets = np.arange(n) * max_points // n
+    return np.flatnonzero(np.r_[True, np.diff(buckets) > 0])
+
+
+def downsample(timestamps, values, max_points, reduce=np.maximum):
+    if len(values) <= max_points:
+        return timestamps, values
+    starts = bucket_starts(len(values), max_points)
+    counts = np.diff(np.r_[starts, len(values)])
+    return np.add.reduceat(timestamps, starts) / counts, reduce.reduceat(values, starts)
+
+
+def weekly_volume(timestamps, volumes, max_points):
+    weeks = np.floor((timestamps - WEEK_OFFSET) / WEEK).astype(np.int64)
+    unique_weeks, index = np.unique(weeks, return_inverse=True)
+    volume = np.bincount(index, weights=volumes)
+    week_starts = unique_weeks * WEEK + WEEK_OFFSET
+    if len(volume) > max_points:
+        starts = bucket_starts(len(volume), max_points)
+        week_starts, volume = week_starts[starts], np.add.reduceat(volume, starts)
+    return {'weeks': isoformat(week_starts), 'volume': rounded(volume)}
+
+
+def linear_trend(timestamps, values):
+    valid = ~np.isnan(values)
+    if np.count_nonzero(valid) < 2 or np.ptp(timestamps[valid]) == 0:
+        return None
+    slope, intercept = np.polyfit((timestamps[valid] - timestamps[valid][0]) / WEEK, values[valid], 1)
+    return {'slope_per_week': round(float(slope), 3), 'start': round(float(intercept), 2)}
+
+
+def exercise_analytics(exercise, unit, formula='epley', max_points=200):
+    columns = load_history(exercise.user_id, exercise.id)
+    result = {'exercise': exercise.exercise_name, 'unit': unit, 'formula': formula, 'count': 0}
+    if columns is None:
+        return result
+    _, timestamps, weights, reps, volumes, counts = columns
+    factor = UNIT_FACTORS[(exercise.author.weight_unit, unit)]
+    weights, volumes = weights * factor, volumes * factor
+    estimates = FORMULAS[formula](weights, reps)
+    rolling_best = np.fmax.accumulate(estimates)
+
+    sampled_times, sampled_estimates = downsample(timestamps, estimates, max_points, np.fmax)
+    _, sampled_best = downsample(timestamps, rolling_best, max_points, np.fmax)
+    result.update({
+        'count': int(counts.sum()),
+        'best_e1rm': rounded(rolling_best[-1:])[0],
+        'series': {
+            'dates': isoformat(sampled_times),
+            'e1rm': rounded(sampled_estimates),
+            'rolling_best': rounded(sampled_best)
+        },
+        'weekly_volume': weekly_volume(timestamps, volumes, max_points),
+        'trend': linear_trend(timestamps, estimates)
+    })
+    return result
+
+
+def user_analytics(user, unit, formula='epley', max_points=200):
+    result = {'user': user.username, 'unit': unit, 'formula': formula, 'count': 0, 'exercises': []}
+    columns = load_history(user.id)
+    if columns is None:
+        return result
+    exercise_ids, timestamps, weights, reps, volumes, counts = columns
+    factor = UNIT_FACTORS[(user.weight_unit, unit)]
+    weights, volumes = weights * factor, volumes * factor
+    estimates = FORMULAS[formula](weights, reps)
+
+    unique_ids, index = np.unique(exercise_ids, return_inverse=True)
+    best = np.full(len(unique_ids), np.nan)
+    np.fmax.at(best, index, estimates)
+    sets = np.bincount(index, weights=counts)
+    names = dict(db.session.execute(
+        sa.select(Exercise.id, Exercise.exercise_name).where(Exercise.id.in_(unique_ids.tolist()))
+    ).all())
+    result.update({
+        'count': int(counts.sum()),
+        'exercises': [
+            {'id': exercise_id, 'name': names.get(exercise_id), 'sets': int(count), 'best_e1rm': value}
+            for exercise_id, count, value in zip(unique_ids.tolist(), sets, rounded(best))
+        ],
+        'weekly_volume': weekly_volume(timestamps, volumes, max_points)
+    })
+    return result
@@ -0,0 +1,109 @@
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+import sqlalchemy as sa
+from app import db
+from app.models import User, Exercise, Progression, ArchivedProgression, ProgressionSummary, TimelineEntry
+
+ArchiveResult = namedtuple('ArchiveResult', ['progressions', 'weeks', 'exercises'])
+
+
+def week_start(date):
+    # Monday 00:00 UTC of the date's week; naive dates (as returned by SQLite) are taken as UTC
+    date = date.astimezone(timezone.utc) if date.tzinfo else date
+    return datetime(date.year, date.month, date.day, tzinfo=timezone.utc) - timedelta(days=date.weekday())
+
+
+def archivable(cutoff):
+    # Each exercise's best set stays hot, so adding sets and the leaderboards never need the archive. Once
+    # that set is lowered or deleted, refresh_max moves a better archived set back under its old id, which
+    # AUTOINCREMENT keeps from being reused. Archiving writes no sync changes, so clients keep these sets.
+    return (
+        sa.select(Progression.id)
+        .join(Progression.exercise)
+        .where(Progression.date < cutoff)
+        .where(Progression.id != sa.func.coalesce(Exercise.best_progression_id, 0))
+    )
+
+
+def summarize(rows):
+    weeks = {}
+    for exercise_id, date, weight, rep in rows:
+        key = (exercise_id, week_start(date))
+        summary = weeks.get(key)
+        if summary is None:
+            summary = weeks[key] = {
+                'exercise_id': exercise_id, 'week_start': key[1], 'set_count': 0, 'volume': 0.0,
+                'best_weight': weight, 'best_rep': rep
+            }
+        summary['set_count'] += 1
+        summary['volume'] += weight * rep
+        if weight * rep > summary['best_weight'] * summary['best_rep']:
+            summary['best_weight'], summary['best_rep'] = weight, rep
+    return weeks
+
+
+def merge_summaries(exercise_ids, weeks):
+    # Sets backdated past the cutoff after an earlier run land in weeks that already have a summary
+    existing = db.session.scalars(
+        sa.select(ProgressionSummary)
+        .where(ProgressionSummary.exercise_id.in_(exercise_ids))
+        .where(ProgressionSummary.week_start.in_({week for _, week in weeks}))
+    )
+    for summary in existing:
+        new = weeks.pop((summary.exercise_id, week_start(summary.week_start)), None)
+        if new is None:
+            continue
+        summary.set_count += new['set_count']
+        summary.volume += new['volume']
+        if new['best_weight'] * new['best_rep'] > summary.best_weight * summary.best_rep:
+            summary.best_weight, summary.best_rep = new['best_weight'], new['best_rep']
+    if weeks:
+        db.session.execute(sa.insert(ProgressionSummary), list(weeks.values()))
+
+
+def archive_progressions(after_days, batch_size=100, now=None):
+    cutoff = week_start((now or datetime.now(timezone.utc)) - timedelta(days=after_days))
+    exercise_ids = db.session.scalars(
+        archivable(cutoff).with_only_columns(Progression.exercise_id).distinct().order_by(Progression.exercise_id)
+    ).all()
+
+    archived = weeks = 0
+    # One transaction per batch of exercises, so the job never holds the write lock for long
+    for i in range(0, len(exercise_ids), batch_size):
+        chunk = exercise_ids[i:i + batch_size]
+        db.session.execute(sa.insert(ArchivedProgression).from_select(
+            ['id', 'rep', 'weight', 'date', 'exercise_id', 'is_record'],
+            sa.select(Progression.id, Progression.rep, Progression.weight, Progression.date, Progression.exercise_id, Progression.is_record)
+            .where(Progression.id.in_(archivable(cutoff).where(Progression.exercise_id.in_(chunk))))
+        ))
+        # Archived rows that are still in the hot table are exactly the ones copied above
+        summaries = summarize(db.session.execute(
+            sa.select(ArchivedProgression.exercise_id, ArchivedProgression.date, ArchivedProgression.weight, ArchivedProgression.rep)
+            .join(Progression, Progression.id == ArchivedProgression.id)
+            .where(ArchivedProgression.exercise_id.in_(chunk))
+        ))
+        counts = {}
+        for summary in summaries.values():
+            counts[summary['exercise_id']] = counts.get(summary['exercise_id'], 0) + summary['set_count']
+        weeks += len(summaries)
+        archived += sum(counts.values())
+        merge_summaries(chunk, summaries)
+
+        moved = sa.select(ArchivedProgression.id).where(ArchivedProgression.exercise_id.in_(chunk))
+        TimelineEntry.remove(moved)
+        db.session.execute(sa.delete(Progression).where(Progression.id.in_(moved)))
+        exercises = Exercise.__table__
+        db.session.execute(
+            exercises.update()
+            .where(exercises.c.id == sa.bindparam('exercise_id'))
+            .values(archived_sets=exercises.c.archived_sets + sa.bindparam('count'), version=exercises.c.version + 1),
+            [{'exercise_id': exercise_id, 'count': count} for exercise_id, count in counts.items()]
+        )
+        User.touch_pages(*db.session.scalars(sa.select(Exercise.user_id).where(Exercise.id.in_(chunk)).distinct()))
+        db.session.commit()
+    return ArchiveResult(archived, weeks, len(exercise_ids))
+
+
+def remove_archived(exercise_id):
+    db.session.execute(sa.delete(ProgressionSummary).where(ProgressionSummary.exercise_id == exercise_id))
+    db.session.execute(sa.delete(ArchivedProgression).where(ArchivedProgression.exercise_id == exercise_id))
@@ -0,0 +1,65 @@
+import queue
+import threading
+from werkzeug.utils import import_string
+
+
+class Subscription:
+
+    def __init__(self, broker, channel, max_queue):
+        self.broker = broker
+        self.channel = channel
+        self._queue = queue.Queue(maxsize=max_queue)
+
+    def put(self, message):
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            # A consumer this far behind has stalled; dropping keeps publishers from blocking on it
+            pass
+
+    def get(self, timeout=None):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+# In-process publish/subscribe of string messages on named channels. Any class with the same constructor
+# and subscribe/unsubscribe/publish methods, whose subscriptions offer get(timeout)/close(), can be
+# configured as BROKER_BACKEND instead, e.g. one relaying through Redis pub/sub so that events published
+# by one worker reach streams held open by another.
+class LocalBroker:
+
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, self.max_queue)
+        with self._lock:
+            self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._channels.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._channels[subscription.channel]
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscriptions = list(self._channels.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.put(message)
+
+
+def create_broker(backend, max_queue):
+    if isinstance(backend, str):
+        backend = import_string(backend)
+    return backend(max_queue=max_queue)
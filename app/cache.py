@@ -0,0 +1,49 @@
+import threading
+import time
+from collections import OrderedDict
+from werkzeug.utils import import_string
+
+
+# In-process cache that evicts the least recently used key once max_size is reached. Any class
+# with the same constructor and get/set(timeout=)/delete/clear methods can be configured as
+# CACHE_BACKEND instead, e.g. a client for a cache shared between workers.
+class LRUCache:
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        expires = time.monotonic() + timeout if timeout else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def create_cache(backend, max_size):
+    if isinstance(backend, str):
+        backend = import_string(backend)
+    return backend(max_size=max_size)
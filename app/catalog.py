@@ -0,0 +1,128 @@
+import sqlalchemy as sa
+from app import db
+from app.models import Exercise, CatalogExercise, ExerciseAlias
+
+# Canonical names and the aliases lifters commonly log them under, loaded by `flask sync-catalog`
+STARTER_CATALOG = {
+    'Bench Press': ('bench', 'flat bench', 'barbell bench press', 'bb bench'),
+    'Incline Bench Press': ('incline bench', 'incline press'),
+    'Overhead Press': ('ohp', 'military press', 'shoulder press'),
+    'Back Squat': ('squat', 'squats', 'barbell squat', 'bb squat'),
+    'Front Squat': ('front squats',),
+    'Deadlift': ('deadlifts', 'dl', 'conventional deadlift'),
+    'Romanian Deadlift': ('rdl', 'romanian deadlifts'),
+    'Barbell Row': ('bent over row', 'bb row', 'pendlay row'),
+    'Pull Up': ('pull ups', 'pullup', 'pullups', 'chin up', 'chin ups'),
+    'Dip': ('dips',),
+    'Lat Pulldown': ('pulldown', 'lat pull down'),
+    'Leg Press': ('leg presses',),
+    'Hip Thrust': ('hip thrusts', 'barbell hip thrust'),
+    'Bicep Curl': ('curl', 'curls', 'barbell curl', 'biceps curl'),
+    'Tricep Extension': ('triceps extension', 'skull crusher', 'skull crushers'),
+}
+
+
+class ExerciseCatalog:
+    # Exercises link to a canonical CatalogExercise by their normalized name: whenever an exercise is flushed
+    # with a new or changed exercise_name, a known alias links it to its entry and an unknown one becomes a new
+    # entry with itself as the only alias. Entries created that way hold one user's free text and stay out of
+    # autocomplete, which only offers curated entries loaded by load(). It matches word prefixes of their
+    # aliases through the catalog_search FTS5 index on SQLite (rebuilt by load(), see the migrations) and
+    # falls back to an index range scan on the alias column elsewhere.
+
+    def __init__(self):
+        sa.event.listen(db.session, 'before_flush', self._before_flush)
+
+    def _before_flush(self, session, flush_context, instances):
+        resolved = {}
+        for exercise in list(session.new) + list(session.dirty):
+            if not isinstance(exercise, Exercise) or not sa.inspect(exercise).attrs.exercise_name.history.has_changes():
+                continue
+            alias = CatalogExercise.normalize(exercise.exercise_name)
+            if alias and alias not in resolved:
+                resolved[alias] = self.lookup(alias, session) or self._create(exercise.exercise_name, alias, session)
+            exercise.catalog = resolved.get(alias)
+
+    def lookup(self, alias, session=db.session):
+        with session.no_autoflush:
+            return session.scalar(sa.select(CatalogExercise).join(ExerciseAlias.catalog).where(ExerciseAlias.alias == alias))
+
+    def _create(self, name, alias, session):
+        catalog = CatalogExercise(name=' '.join(name.split())[:100])
+        session.add(ExerciseAlias(alias=alias, catalog=catalog))
+        return catalog
+
+    def search(self, text, limit=10):
+        terms = CatalogExercise.normalize(text).split()
+        if not terms:
+            return []
+        if db.engine.dialect.name == 'sqlite':
+            # Only the first matches in rowid order are ranked, so short, common prefixes stay as cheap as long ones
+            return db.session.execute(
+                sa.text(
+                    'SELECT c.id, c.name FROM ('
+                    'SELECT rowid, rank FROM catalog_search WHERE catalog_search MATCH :match LIMIT :candidates'
+                    ') matches '
+                    'JOIN exercise_aliases a ON a.id = matches.rowid '
+                    'JOIN catalog_exercises c ON c.id = a.catalog_id '
+                    'WHERE c.curated '
+                    'GROUP BY c.id, c.name ORDER BY min(matches.rank), length(c.name) LIMIT :limit'
+                ),
+                {'match': ' '.join(f'"{term}"*' for term in terms), 'candidates': limit * 20, 'limit': limit}
+            ).all()
+        prefix = ' '.join(terms)
+        return db.session.execute(
+            sa.select(CatalogExercise.id, CatalogExercise.name)
+            .join(ExerciseAlias.catalog)
+            .where(ExerciseAlias.alias >= prefix, ExerciseAlias.alias < prefix + '\uffff')
+            .where(CatalogExercise.curated.is_(True))
+            .group_by(CatalogExercise.id, CatalogExercise.name)
+            .order_by(sa.func.length(CatalogExercise.name))
+            .limit(limit)
+        ).all()
+
+    def merge(self, source_id, target_id):
+        db.session.execute(sa.update(ExerciseAlias).where(ExerciseAlias.catalog_id == source_id).values(catalog_id=target_id))
+        db.session.execute(sa.update(Exercise).where(Exercise.catalog_id == source_id).values(catalog_id=target_id))
+        db.session.execute(sa.delete(CatalogExercise).where(CatalogExercise.id == source_id))
+
+    def load(self, entries):
+        # Curated entries take over aliases that users created before the entry existed
+        for name, aliases in entries.items():
+            catalog = self.lookup(CatalogExercise.normalize(name))
+            if catalog is None:
+                catalog = CatalogExercise(name=name)
+                db.session.add(catalog)
+                db.session.flush()
+            catalog.name = name
+            catalog.curated = True
+            for alias in {CatalogExercise.normalize(alias) for alias in (name,) + tuple(aliases)}:
+                existing = db.session.scalar(sa.select(ExerciseAlias).where(ExerciseAlias.alias == alias))
+                if existing is None:
+                    db.session.add(ExerciseAlias(alias=alias, catalog_id=catalog.id))
+                elif existing.catalog_id != catalog.id:
+                    self.merge(existing.catalog_id, catalog.id)
+            db.session.flush()
+        if db.engine.dialect.name == 'sqlite':
+            db.session.execute(sa.text("INSERT INTO catalog_search(catalog_search) VALUES ('rebuild')"))
+
+    def link_unlinked(self):
+        # For rows written with bulk inserts, which bypass the flush hook
+        names = db.session.scalars(sa.select(Exercise.exercise_name).where(Exercise.catalog_id.is_(None)).distinct()).all()
+        groups = {}
+        for name in names:
+            groups.setdefault(CatalogExercise.normalize(name), []).append(name)
+        groups.pop('', None)
+        catalogs = {alias: self.lookup(alias) or self._create(group[0], alias, db.session) for alias, group in groups.items()}
+        db.session.flush()
+        for alias, group in groups.items():
+            db.session.execute(
+                sa.update(Exercise)
+                .where(Exercise.catalog_id.is_(None), Exercise.exercise_name.in_(group))
+                .values(catalog_id=catalogs[alias].id),
+                execution_options={'synchronize_session': False}
+            )
+        return len(names)
+
+
+exercise_catalog = ExerciseCatalog()
@@ -0,0 +1,13 @@
+import sqlite3
+import sqlalchemy as sa
+from app import app
+
+
+@sa.event.listens_for(sa.engine.Engine, 'connect')
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for name, value in app.config['SQLITE_PRAGMAS'].items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+    cursor.close()
@@ -0,0 +1,62 @@
+import csv
+import io
+import json
+import sqlalchemy as sa
+from app import db
+from app.models import Exercise, Progression, ArchivedProgression
+
+CSV_HEADER = ['exercise', 'weight', 'unit', 'reps', 'date', 'timestamp']
+
+
+def history_rows(user_id, batch_size=1000):
+    # Archived progressions keep their ids, so the export reads both tables in the order sets were logged
+    history = sa.union_all(*(
+        sa.select(Exercise.id.label('exercise_id'), Exercise.exercise_name, model.id, model.weight, model.rep, model.date)
+        .join(Exercise, Exercise.id == model.exercise_id)
+        .where(Exercise.user_id == user_id, Exercise.deleting.is_(False))
+        for model in (ArchivedProgression, Progression)
+    )).subquery()
+    # yield_per streams the result in fixed-size partitions instead of buffering the whole history
+    query = (
+        sa.select(history.c.exercise_name, history.c.weight, history.c.rep, history.c.date)
+        .order_by(history.c.exercise_id, history.c.id)
+        .execution_options(yield_per=batch_size)
+    )
+    yield from db.session.execute(query)
+
+
+def export_csv(user_id, weight_unit, date_display, batch_size=1000):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    for i, (name, weight, rep, date) in enumerate(history_rows(user_id, batch_size), 1):
+        writer.writerow([name, weight, weight_unit, rep, date.strftime(date_display), date.isoformat()])
+        if i % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_ndjson(user_id, weight_unit, date_display, batch_size=1000):
+    lines = []
+    for name, weight, rep, date in history_rows(user_id, batch_size):
+        lines.append(json.dumps({
+            'exercise': name,
+            'weight': weight,
+            'unit': weight_unit,
+            'reps': rep,
+            'date': date.strftime(date_display),
+            'timestamp': date.isoformat()
+        }))
+        if len(lines) == batch_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+EXPORTERS = {
+    'csv': (export_csv, 'text/csv'),
+    'ndjson': (export_ndjson, 'application/x-ndjson')
+}
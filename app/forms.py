@@ -1,4 +1,5 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileRequired, FileAllowed
 from wtforms import StringField, PasswordField, BooleanField, SubmitField, FloatField, IntegerField, RadioField, SelectField
 from wtforms.validators import DataRequired, ValidationError, Email, EqualTo, InputRequired, Length
 import sqlalchemy as sa
@@ -97,3 +98,8 @@ class SendFriendRequestForm(FlaskForm):
 class ManageFriendRequestsForm(FlaskForm):
     accept = SubmitField('Accept')
     reject = SubmitField('Reject')
+
+
+class ImportForm(FlaskForm):
+    file = FileField('History File', validators=[FileRequired(), FileAllowed(['csv', 'ndjson', 'jsonl', 'json'], 'CSV or NDJSON files only.')])
+    submit = SubmitField('Import')
@@ -0,0 +1,46 @@
+from hashlib import blake2b
+
+# Friend codes are a keyed permutation of a counter: index i of the sequence maps through a 4-round Feistel
+# network over 30 bits and is written as 6 Crockford base32 characters. The permutation is a bijection, so
+# distinct indices give distinct codes without looking anything up, while consecutive users still get
+# unrelated codes. Codes made only of hex characters are skipped because they may belong to accounts
+# created before the allocator, when friend codes were random hex strings.
+
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+CODE_LENGTH = 6
+HALF_BITS = 15
+HALF_MASK = (1 << HALF_BITS) - 1
+SEQUENCE_SIZE = 1 << (2 * HALF_BITS)
+ROUNDS = 4
+LEGACY_CHARACTERS = frozenset('0123456789ABCDEF')
+
+
+def _round(key, i, value):
+    digest = blake2b(bytes([i]) + value.to_bytes(2, 'big'), key=key, digest_size=4).digest()
+    return int.from_bytes(digest, 'big') & HALF_MASK
+
+
+def permute(key, index):
+    left, right = index >> HALF_BITS, index & HALF_MASK
+    for i in range(ROUNDS):
+        left, right = right, left ^ _round(key, i, right)
+    return (left << HALF_BITS) | right
+
+
+def encode(value):
+    characters = []
+    for _ in range(CODE_LENGTH):
+        value, digit = divmod(value, len(ALPHABET))
+        characters.append(ALPHABET[digit])
+    return ''.join(reversed(characters))
+
+
+def is_legacy(code):
+    return set(code) <= LEGACY_CHARACTERS
+
+
+def codes_for(key, start, count):
+    if start + count > SEQUENCE_SIZE:
+        raise RuntimeError('Friend code sequence exhausted')
+    codes = (encode(permute(key, index)) for index in range(start, start + count))
+    return [code for code in codes if not is_legacy(code)]
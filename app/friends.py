@@ -0,0 +1,125 @@
+from array import array
+import sqlalchemy as sa
+from app import app, db
+from app.cache import create_cache
+from app.models import User, FriendRequest, friendship
+from app.replicas import primary_reads
+
+
+class FriendGraph:
+    # Each user's friends are cached as a sorted array of ids, so counts are O(1). Writes go through
+    # add()/remove(), which change both directions of the symmetric friendship table in the caller's
+    # transaction and drop the cached arrays once it commits. Friend suggestions are cached alongside and
+    # invalidated only for the users a change affects. Only this worker's cache is invalidated, so access
+    # checks and live feed recipients read the friendship table instead and never see a removed friend.
+
+    def __init__(self, cache, ttl, suggestions_ttl):
+        self.cache = cache
+        self.ttl = ttl
+        self.suggestions_ttl = suggestions_ttl
+        sa.event.listen(db.session, 'before_commit', self._before_commit)
+        sa.event.listen(db.session, 'after_commit', self._after_commit)
+        sa.event.listen(db.session, 'after_rollback', self._after_rollback)
+
+    def friend_ids(self, user_id, cached=True):
+        ids = self.cache.get(('friends', user_id)) if cached else None
+        if ids is None:
+            with primary_reads():
+                ids = array('q', db.session.scalars(
+                    sa.select(friendship.c.friend_id)
+                    .where(friendship.c.user_id == user_id)
+                    .order_by(friendship.c.friend_id)
+                ))
+            self.cache.set(('friends', user_id), ids, timeout=self.ttl)
+        return ids
+
+    def is_friend(self, user_id, other_id):
+        return db.session.scalar(
+            sa.select(sa.exists().where(friendship.c.user_id == user_id, friendship.c.friend_id == other_id))
+        )
+
+    def friend_count(self, user_id):
+        return len(self.friend_ids(user_id))
+
+    def suggestions(self, user_id, limit=10):
+        suggestions = self.cache.get(('suggestions', user_id))
+        if suggestions is None:
+            with primary_reads():
+                suggestions = db.session.execute(self._suggestions_query(user_id, limit)).all()
+            suggestions = [tuple(row) for row in suggestions]
+            self.cache.set(('suggestions', user_id), suggestions, timeout=self.suggestions_ttl)
+        users = {user.id: user for user in db.session.scalars(
+            sa.select(User).where(User.id.in_([suggested_id for suggested_id, _ in suggestions]))
+        )}
+        return [(users[suggested_id], mutual) for suggested_id, mutual in suggestions if suggested_id in users]
+
+    @staticmethod
+    def _suggestions_query(user_id, limit):
+        # Friends of friends ranked by mutual friend count, as one self-join over the symmetric table
+        mine = friendship.alias('mine')
+        theirs = friendship.alias('theirs')
+        friend_ids = sa.select(friendship.c.friend_id).where(friendship.c.user_id == user_id)
+        pending_ids = sa.union(
+            sa.select(FriendRequest.receiver_id).where(FriendRequest.sender_id == user_id),
+            sa.select(FriendRequest.sender_id).where(FriendRequest.receiver_id == user_id)
+        )
+        mutual = sa.func.count().label('mutual')
+        return (
+            sa.select(theirs.c.friend_id, mutual)
+            .select_from(mine.join(theirs, theirs.c.user_id == mine.c.friend_id))
+            .where(mine.c.user_id == user_id)
+            .where(theirs.c.friend_id != user_id)
+            .where(theirs.c.friend_id.not_in(friend_ids))
+            .where(theirs.c.friend_id.not_in(pending_ids))
+            .group_by(theirs.c.friend_id)
+            .order_by(mutual.desc(), theirs.c.friend_id)
+            .limit(limit)
+        )
+
+    def add(self, user_id, friend_id):
+        db.session.execute(friendship.insert(), [
+            {'user_id': user_id, 'friend_id': friend_id},
+            {'user_id': friend_id, 'friend_id': user_id}
+        ])
+        User.touch_pages(user_id, friend_id)
+        self._changed(user_id, friend_id)
+
+    def remove(self, user_id, friend_id):
+        User.touch_pages(user_id, friend_id)
+        db.session.execute(friendship.delete().where(sa.or_(
+            sa.and_(friendship.c.user_id == user_id, friendship.c.friend_id == friend_id),
+            sa.and_(friendship.c.user_id == friend_id, friendship.c.friend_id == user_id)
+        )))
+        self._changed(user_id, friend_id)
+
+    def requests_changed(self, sender_id, receiver_id):
+        User.touch_pages(sender_id, receiver_id, friends=False)
+        db.session.info.setdefault('friend_request_changes', set()).update((sender_id, receiver_id))
+
+    def _changed(self, *user_ids):
+        db.session.info.setdefault('friend_graph_changes', set()).update(user_ids)
+
+    def _before_commit(self, session):
+        # A new or removed friendship changes the mutual counts seen by both users and all their friends
+        changed = session.info.get('friend_graph_changes', set())
+        stale = changed | session.info.pop('friend_request_changes', set())
+        if changed:
+            stale.update(session.scalars(sa.select(friendship.c.friend_id).where(friendship.c.user_id.in_(changed))))
+        session.info['stale_suggestions'] = stale
+
+    def _after_commit(self, session):
+        for user_id in session.info.pop('friend_graph_changes', ()):
+            self.cache.delete(('friends', user_id))
+        for user_id in session.info.pop('stale_suggestions', ()):
+            self.cache.delete(('suggestions', user_id))
+
+    def _after_rollback(self, session):
+        for key in ('friend_graph_changes', 'friend_request_changes', 'stale_suggestions'):
+            session.info.pop(key, None)
+
+
+friend_graph = FriendGraph(
+    create_cache(app.config['CACHE_BACKEND'], app.config['FRIEND_GRAPH_CACHE_SIZE']),
+    app.config['FRIEND_GRAPH_CACHE_TTL'],
+    app.config['SUGGESTIONS_CACHE_TTL']
+)
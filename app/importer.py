@@ -0,0 +1,141 @@
+import csv
+import json
+import math
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+import sqlalchemy as sa
+from app import db
+from app.models import Exercise, Progression, TimelineEntry, BestLift
+from app.sync import sync_log
+
+ImportResult = namedtuple('ImportResult', ['rows', 'skipped', 'exercises_created', 'seconds'])
+
+
+def rows_per_second(result):
+    return result.rows / result.seconds if result.seconds else float(result.rows)
+
+
+def read_csv(stream):
+    # A DictReader rather than a generator, so reading carries on past a row that raises csv.Error
+    return csv.DictReader(stream)
+
+
+def read_ndjson(stream):
+    # Lines are decoded by parse_record, so a malformed one is skipped like any other invalid row
+    return (line for line in stream if line.strip())
+
+
+READERS = {'csv': read_csv, 'ndjson': read_ndjson}
+
+
+def format_from_filename(filename):
+    return 'ndjson' if filename.lower().endswith(('.ndjson', '.jsonl', '.json')) else 'csv'
+
+
+def parse_date(value):
+    if not value:
+        return datetime.now(timezone.utc)
+    date = datetime.fromisoformat(value)
+    return date if date.tzinfo else date.replace(tzinfo=timezone.utc)
+
+
+def parse_record(record):
+    if isinstance(record, str):
+        record = json.loads(record)
+    if not isinstance(record, dict):
+        raise ValueError('record is not an object')
+    name = str(record.get('exercise') or '').strip()
+    weight = float(record['weight'])
+    reps = int(record['reps'])
+    # Uploads are decoded with errors='replace', so U+FFFD marks bytes that were not valid UTF-8
+    if not name or '\ufffd' in name or not math.isfinite(weight) or weight < 0 or reps < 1:
+        raise ValueError('invalid record')
+    # Exported files carry the display-formatted date alongside an ISO 8601 timestamp
+    return name[:100], weight, reps, parse_date(record.get('timestamp') or record.get('date'))
+
+
+class ProgressionImporter:
+    # Inserts parsed rows in batches so memory stays bounded by batch_size and the user's exercise count
+
+    def __init__(self, user, batch_size=5000):
+        self.user = user
+        self.batch_size = batch_size
+        self.exercises = {}
+        self.best = {}
+        for exercise in db.session.scalars(sa.select(Exercise).where(Exercise.user_id == user.id, Exercise.deleting.is_(False)).order_by(Exercise.id)):
+            self.exercises.setdefault(exercise.exercise_name.strip().casefold(), exercise)
+            self.best[exercise.id] = exercise.best_volume if exercise.best_progression_id else None
+        self.exercises_created = 0
+
+    def exercise_for(self, name):
+        exercise = self.exercises.get(name.casefold())
+        if exercise is None:
+            exercise = Exercise(exercise_name=name, user_id=self.user.id)
+            db.session.add(exercise)
+            db.session.flush()
+            self.exercises[name.casefold()] = exercise
+            self.best[exercise.id] = None
+            self.exercises_created += 1
+        return exercise
+
+    def flush(self, batch):
+        rows = []
+        touched = {}
+        records = {}
+        for i, (name, weight, reps, date) in enumerate(batch):
+            exercise = self.exercise_for(name)
+            volume = weight * reps
+            is_record = self.best[exercise.id] is None or volume > self.best[exercise.id]
+            if is_record:
+                self.best[exercise.id] = volume
+                records[exercise.id] = i
+            rows.append({'exercise_id': exercise.id, 'weight': weight, 'rep': reps, 'date': date, 'is_record': is_record})
+            touched[exercise.id] = exercise
+
+        inserted = db.session.execute(
+            sa.insert(Progression).returning(Progression.id, Progression.date, Progression.weight, Progression.rep, sort_by_parameter_order=True),
+            rows
+        ).all()
+        TimelineEntry.fan_out_many([(row.id, row.date) for row in inserted], self.user.id)
+        sync_log.record(self.user.id, 'progression', [row.id for row in inserted])
+        # Sets are only added, so the best set tracked above is the exercise's best without rescanning its history
+        for exercise_id, i in records.items():
+            exercise = touched[exercise_id]
+            exercise.best_progression_id, exercise.best_volume = inserted[i].id, self.best[exercise_id]
+            BestLift.consider(exercise, inserted[i])
+        for exercise in touched.values():
+            exercise.touch()
+        db.session.commit()
+
+    def run(self, records, on_batch=None):
+        start = time.perf_counter()
+        count = skipped = 0
+        batch = []
+        records = iter(records)
+        while True:
+            try:
+                batch.append(parse_record(next(records)))
+            except StopIteration:
+                break
+            except UnicodeDecodeError:
+                # A strictly decoded stream can't resume after bad bytes
+                skipped += 1
+                break
+            except (KeyError, TypeError, ValueError, csv.Error):
+                skipped += 1
+                continue
+            if len(batch) >= self.batch_size:
+                self.flush(batch)
+                count += len(batch)
+                batch = []
+                if on_batch:
+                    on_batch(count, time.perf_counter() - start)
+        if batch:
+            self.flush(batch)
+            count += len(batch)
+        return ImportResult(count, skipped, self.exercises_created, time.perf_counter() - start)
+
+
+def import_progressions(user, stream, fmt='csv', batch_size=5000, on_batch=None):
+    return ProgressionImporter(user, batch_size).run(READERS[fmt](stream), on_batch=on_batch)
@@ -0,0 +1,165 @@
+import threading
+import time
+import traceback
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql, sqlite
+from flask import current_app
+from app import db
+from app.models import Job
+
+# Dialects whose INSERT supports ON CONFLICT DO NOTHING, used to enqueue deduplicated jobs
+INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+JobResult = namedtuple('JobResult', ['id', 'name', 'status', 'attempts', 'wait_ms', 'duration_ms'])
+
+
+def aware(date):
+    return date if date.tzinfo else date.replace(tzinfo=timezone.utc)
+
+
+class JobQueue:
+    # Deferred work stored in the jobs table and run by `flask worker`. enqueue() adds the row in the
+    # caller's transaction, so a job exists only once the request that queued it commits. Workers claim the
+    # next due job with one UPDATE and record its outcome in the same transaction as the task's writes.
+    # Failed jobs are retried with exponential backoff up to max_attempts; a job still running after
+    # JOB_TIMEOUT seconds is assumed lost with its worker and claimed again, so tasks must be idempotent.
+
+    def __init__(self):
+        self.tasks = {}
+
+    def task(self, name, max_attempts=3):
+        def register(func):
+            self.tasks[name] = (func, max_attempts)
+            return func
+        return register
+
+    def enqueue(self, name, payload=None, dedup_key=None, delay=0):
+        func, max_attempts = self.tasks[name]
+        payload = payload or {}
+        if current_app.config['JOBS_INLINE']:
+            func(**payload)
+            return None
+        run_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+        if dedup_key is None:
+            job = Job(name=name, payload=payload, max_attempts=max_attempts, run_at=run_at)
+            db.session.add(job)
+            return job
+        # A concurrent request may queue the same key between a lookup and an insert, so the insert itself
+        # skips a duplicate. If the existing job is claimed before it can be read, its key is free again.
+        insert = INSERTS[db.engine.dialect.name]
+        while True:
+            job_id = db.session.scalar(
+                insert(Job)
+                .values(name=name, payload=payload, dedup_key=dedup_key, max_attempts=max_attempts, run_at=run_at)
+                .on_conflict_do_nothing(index_elements=[Job.dedup_key])
+                .returning(Job.id)
+            )
+            if job_id is None:
+                job_id = db.session.scalar(sa.select(Job.id).where(Job.dedup_key == dedup_key))
+            if job_id is not None:
+                return db.session.get(Job, job_id)
+
+    def claim(self):
+        now = datetime.now(timezone.utc)
+        claimable = sa.or_(
+            sa.and_(Job.status == 'queued', Job.run_at <= now),
+            sa.and_(Job.status == 'running', Job.started_at < now - timedelta(seconds=current_app.config['JOB_TIMEOUT']))
+        )
+        # The condition is repeated on the outer UPDATE so a job another worker claimed first is skipped
+        next_id = sa.select(Job.id).where(claimable).order_by(Job.run_at, Job.id).limit(1).scalar_subquery()
+        job = db.session.execute(
+            sa.update(Job)
+            .where(Job.id == next_id, claimable)
+            .values(status='running', attempts=Job.attempts + 1, started_at=now, dedup_key=None)
+            .returning(Job.id, Job.name, Job.payload, Job.attempts, Job.max_attempts, Job.run_at),
+            execution_options={'synchronize_session': False}
+        ).first()
+        db.session.commit()
+        return job, now
+
+    def run_next(self):
+        job, started = self.claim()
+        if job is None:
+            return None
+        wait_ms = max((started - aware(job.run_at)).total_seconds() * 1000, 0)
+        start = time.perf_counter()
+        try:
+            func, _ = self.tasks[job.name]
+            func(**job.payload)
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception(f'Job {job.id} ({job.name}) failed on attempt {job.attempts} of {job.max_attempts}')
+            if job.attempts < job.max_attempts:
+                delay = current_app.config['JOB_RETRY_DELAY'] * 2 ** (job.attempts - 1)
+                values = {'status': 'queued', 'run_at': datetime.now(timezone.utc) + timedelta(seconds=delay)}
+            else:
+                values = {'status': 'failed', 'finished_at': datetime.now(timezone.utc)}
+            values['error'] = traceback.format_exc()
+        else:
+            values = {'status': 'done', 'finished_at': datetime.now(timezone.utc), 'error': None}
+        duration_ms = (time.perf_counter() - start) * 1000
+        db.session.execute(
+            sa.update(Job).where(Job.id == job.id).values(wait_ms=wait_ms, duration_ms=duration_ms, **values),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+        return JobResult(job.id, job.name, values['status'], job.attempts, wait_ms, duration_ms)
+
+    def work(self, app, threads=1, poll_interval=1.0, burst=False, on_result=None):
+        stop = threading.Event()
+
+        def loop():
+            with app.app_context():
+                while not stop.is_set():
+                    try:
+                        result = self.run_next()
+                    except Exception:
+                        # e.g. the database is locked or unreachable; back off and try again
+                        app.logger.exception('Worker failed to claim a job')
+                        db.session.rollback()
+                        result = None
+                    finally:
+                        db.session.remove()
+                    if result is not None:
+                        if on_result is not None:
+                            on_result(result)
+                    elif burst:
+                        return
+                    else:
+                        stop.wait(poll_interval)
+
+        workers = [threading.Thread(target=loop, name=f'worker-{i}', daemon=True) for i in range(threads)]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                while worker.is_alive():
+                    worker.join(0.5)
+        except KeyboardInterrupt:
+            # Let the jobs in progress finish and commit before exiting
+            stop.set()
+            for worker in workers:
+                worker.join()
+
+    def stats(self):
+        return db.session.execute(
+            sa.select(
+                Job.name, Job.status, sa.func.count(), sa.func.avg(Job.wait_ms),
+                sa.func.avg(Job.duration_ms), sa.func.max(Job.duration_ms)
+            )
+            .group_by(Job.name, Job.status)
+            .order_by(Job.name, Job.status)
+        ).all()
+
+    def purge(self, days):
+        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+        result = db.session.execute(
+            sa.delete(Job).where(Job.status.in_(('done', 'failed')), Job.finished_at < cutoff),
+            execution_options={'synchronize_session': False}
+        )
+        return result.rowcount
+
+
+job_queue = JobQueue()
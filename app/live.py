@@ -0,0 +1,110 @@
+import json
+import threading
+import time
+from collections import Counter
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+from app import app, db
+from app.broker import create_broker
+from app.friends import friend_graph
+from app.models import Progression
+
+
+class LiveFeed:
+    # Pushes new and edited feed entries to friends who have the home page open. Progression inserts and
+    # updates made through the ORM are collected per session, turned into messages before the commit (while SQL can
+    # still run) and published to each friend's channel once it succeeds. Bulk imports go through Core
+    # inserts and are deliberately not streamed. Connections are capped per process and per user; idle
+    # streams only wake up to send a heartbeat comment, and are closed after max_age so that browsers
+    # reconnect and rebalance across workers.
+
+    def __init__(self, broker, max_connections, max_per_user, heartbeat, max_age):
+        self.broker = broker
+        self.max_connections = max_connections
+        self.max_per_user = max_per_user
+        self.heartbeat = heartbeat
+        self.max_age = max_age
+        self._connections = Counter()
+        self._lock = threading.Lock()
+        sa.event.listen(Progression, 'after_insert', self._after_write('created'))
+        sa.event.listen(Progression, 'after_update', self._after_write('updated'))
+        sa.event.listen(db.session, 'before_commit', self._before_commit)
+        sa.event.listen(db.session, 'after_commit', self._after_commit)
+        sa.event.listen(db.session, 'after_rollback', self._after_rollback)
+
+    @staticmethod
+    def channel(user_id):
+        return f'feed:{user_id}'
+
+    def _after_write(self, kind):
+        def listener(mapper, connection, target):
+            changes = so.object_session(target).info.setdefault('live_feed_changes', {})
+            changes.setdefault(target.id, (kind, target))
+        return listener
+
+    @staticmethod
+    def entry(progression):
+        exercise = progression.exercise
+        author = exercise.author
+        return {
+            'id': progression.id, 'username': author.username, 'exercise': exercise.exercise_name,
+            'weight': progression.weight, 'unit': author.weight_unit, 'reps': progression.rep,
+            'date': progression.simplified_date(), 'is_max': progression.is_max(), 'is_record': progression.is_record
+        }
+
+    def _before_commit(self, session):
+        # The commit's own flush runs after this hook, so flush first to collect its writes too
+        session.flush()
+        changes = session.info.pop('live_feed_changes', None)
+        if not changes:
+            return
+        messages = []
+        for kind, progression in changes.values():
+            if sa.inspect(progression).was_deleted:
+                continue
+            message = json.dumps({'kind': kind, 'entry': self.entry(progression)})
+            messages.append((list(friend_graph.friend_ids(progression.exercise.user_id, cached=False)), message))
+        session.info['live_feed_messages'] = messages
+
+    def _after_commit(self, session):
+        for recipients, message in session.info.pop('live_feed_messages', ()):
+            for user_id in recipients:
+                self.broker.publish(self.channel(user_id), message)
+
+    def _after_rollback(self, session):
+        session.info.pop('live_feed_changes', None)
+        session.info.pop('live_feed_messages', None)
+
+    def connect(self, user_id):
+        with self._lock:
+            if sum(self._connections.values()) >= self.max_connections or self._connections[user_id] >= self.max_per_user:
+                return None
+            self._connections[user_id] += 1
+        return self.broker.subscribe(self.channel(user_id))
+
+    def disconnect(self, user_id, subscription):
+        subscription.close()
+        with self._lock:
+            self._connections[user_id] -= 1
+            if not self._connections[user_id]:
+                del self._connections[user_id]
+
+    def stream(self, subscription):
+        # The caller releases the connection with disconnect() once the response is closed
+        deadline = time.monotonic() + self.max_age
+        yield f'retry: {self.heartbeat * 1000}\n\n'
+        while time.monotonic() < deadline:
+            message = subscription.get(timeout=self.heartbeat)
+            if message is None:
+                yield ': heartbeat\n\n'
+            else:
+                yield f'event: progression\ndata: {message}\n\n'
+
+
+live_feed = LiveFeed(
+    create_broker(app.config['BROKER_BACKEND'], app.config['LIVE_FEED_QUEUE_SIZE']),
+    app.config['LIVE_FEED_MAX_CONNECTIONS'],
+    app.config['LIVE_FEED_MAX_PER_USER'],
+    app.config['LIVE_FEED_HEARTBEAT'],
+    app.config['LIVE_FEED_MAX_AGE']
+)
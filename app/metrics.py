@@ -0,0 +1,136 @@
+import hmac
+import threading
+import time
+from flask import g, request, has_app_context, before_render_template, template_rendered, Response, abort
+import sqlalchemy as sa
+from app import app
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+class Histogram:
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint, value):
+        with self._lock:
+            series = self._series.setdefault(endpoint, {'buckets': [0] * len(self.buckets), 'sum': 0, 'count': 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for endpoint, series in self._series.items():
+                for bound, count in zip(self.buckets, series['buckets']):
+                    lines.append(f'{self.name}_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{endpoint="{endpoint}",le="+Inf"}} {series["count"]}')
+                lines.append(f'{self.name}_sum{{endpoint="{endpoint}"}} {series["sum"]}')
+                lines.append(f'{self.name}_count{{endpoint="{endpoint}"}} {series["count"]}')
+        return '\n'.join(lines)
+
+
+request_duration = Histogram('gymlogger_request_duration_seconds', 'Total request latency.', LATENCY_BUCKETS)
+sql_statements = Histogram('gymlogger_request_sql_statements', 'SQL statements executed per request.', STATEMENT_BUCKETS)
+sql_duration = Histogram('gymlogger_request_sql_duration_seconds', 'Time spent executing SQL per request.', LATENCY_BUCKETS)
+render_duration = Histogram('gymlogger_request_render_duration_seconds', 'Time spent rendering templates per request.', LATENCY_BUCKETS)
+HISTOGRAMS = (request_duration, sql_statements, sql_duration, render_duration)
+
+
+class RequestStats:
+    def __init__(self, record_statements):
+        self.start = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.render_time = 0.0
+        self.render_depth = 0
+        self.render_start = 0.0
+        self.statements = [] if record_statements else None
+
+
+def current_stats():
+    return g.get('request_stats') if has_app_context() else None
+
+
+@sa.event.listens_for(sa.engine.Engine, 'before_cursor_execute')
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+@sa.event.listens_for(sa.engine.Engine, 'after_cursor_execute')
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    stats = current_stats()
+    if stats is not None:
+        stats.sql_count += 1
+        stats.sql_time += elapsed
+        if stats.statements is not None:
+            stats.statements.append((elapsed, statement))
+
+
+# Nested renders (e.g. cached exercise cards inside a page) only count towards the outermost one
+@before_render_template.connect_via(app)
+def render_started(sender, template, context, **extra):
+    stats = current_stats()
+    if stats is not None:
+        if stats.render_depth == 0:
+            stats.render_start = time.perf_counter()
+        stats.render_depth += 1
+
+
+@template_rendered.connect_via(app)
+def render_finished(sender, template, context, **extra):
+    stats = current_stats()
+    if stats is not None and stats.render_depth:
+        stats.render_depth -= 1
+        if stats.render_depth == 0:
+            stats.render_time += time.perf_counter() - stats.render_start
+
+
+@app.before_request
+def start_request_stats():
+    g.request_stats = RequestStats(record_statements=app.config['SLOW_REQUEST_MS'] > 0)
+
+
+@app.after_request
+def record_request_stats(response):
+    stats = current_stats()
+    if stats is None or request.endpoint == 'metrics':
+        return response
+    endpoint = request.endpoint or 'unmatched'
+    total = time.perf_counter() - stats.start
+    request_duration.observe(endpoint, total)
+    sql_statements.observe(endpoint, stats.sql_count)
+    sql_duration.observe(endpoint, stats.sql_time)
+    render_duration.observe(endpoint, stats.render_time)
+
+    if app.config['SERVER_TIMING_HEADER']:
+        response.headers['Server-Timing'] = (
+            f'sql;dur={stats.sql_time * 1000:.1f};desc="{stats.sql_count} queries", '
+            f'render;dur={stats.render_time * 1000:.1f}, total;dur={total * 1000:.1f}'
+        )
+    if stats.statements is not None and total * 1000 >= app.config['SLOW_REQUEST_MS']:
+        statements = '\n'.join(f'  {elapsed * 1000:.1f}ms {statement}' for elapsed, statement in stats.statements)
+        app.logger.warning(
+            f'Slow request {request.method} {request.full_path} ({endpoint}): {total * 1000:.1f}ms total, '
+            f'{stats.sql_count} queries in {stats.sql_time * 1000:.1f}ms, render {stats.render_time * 1000:.1f}ms\n{statements}'
+        )
+    return response
+
+
+@app.route('/metrics')
+def metrics():
+    token = app.config['METRICS_TOKEN']
+    authorization = request.headers.get('Authorization', '').encode('latin-1', 'replace')
+    if not token or not hmac.compare_digest(authorization, f'Bearer {token}'.encode()):
+        abort(403)
+    body = '\n'.join(histogram.render() for histogram in HISTOGRAMS) + '\n'
+    return Response(body, mimetype='text/plain; version=0.0.4')
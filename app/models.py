@@ -1,17 +1,30 @@
 from typing import Optional, List
 import sqlalchemy as sa
 import sqlalchemy.orm as so
-from app import db, login
-from datetime import datetime, timezone
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import current_app
+from app import db, login, render_cache, user_cache, password_hasher
+from app.units import UNIT_FACTORS
+from app import friend_codes
+from datetime import datetime, timedelta, timezone
 from hashlib import md5
 from flask_login import UserMixin
+from sqlalchemy.ext.hybrid import hybrid_property
 import secrets
 
 
 @login.user_loader
 def load_user(id):
-    return db.session.get(User, int(id))
+    ttl = current_app.config['USER_CACHE_TTL']
+    if not ttl:
+        return db.session.get(User, int(id))
+    data = user_cache.get(('user', int(id)))
+    if data is None:
+        user = db.session.get(User, int(id))
+        if user is None:
+            return None
+        data = user.cache_data()
+        user_cache.set(('user', user.id), data, timeout=ttl)
+    return CachedUser(data)
 
 
 friendship = sa.Table(
@@ -20,6 +33,14 @@ friendship = sa.Table(
     sa.Column('friend_id', sa.Integer, sa.ForeignKey('user.id'), primary_key=True)
 )
 
+# Single row holding the next unclaimed index of the friend code sequence and the permutation key
+friend_code_sequence = sa.Table(
+    'friend_code_sequence', db.metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('next_index', sa.BigInteger, nullable=False),
+    sa.Column('key', sa.String(32), nullable=False)
+)
+
 
 class User(UserMixin, db.Model):
     __tablename__ = 'user'
@@ -28,10 +49,10 @@ class User(UserMixin, db.Model):
     username: so.Mapped[str] = so.mapped_column(sa.String(64), index=True, unique=True)
     email: so.Mapped[str] = so.mapped_column(sa.String(120), index=True, unique=True)
     password_hash: so.Mapped[Optional[str]] = so.mapped_column(sa.String(256))
-    exercises: so.WriteOnlyMapped[List['Exercise']] = so.relationship('Exercise', back_populates='author', lazy='dynamic')
+    exercises: so.WriteOnlyMapped[List['Exercise']] = so.relationship('Exercise', back_populates='author')
     weight_unit: so.Mapped[str] = so.mapped_column(sa.String(3), default='lbs')
     date_display: so.Mapped[str] = so.mapped_column(sa.String(10), default='%m/%d/%Y')
-    friend_code: so.Mapped[str] = so.mapped_column(sa.String(6), index=True, unique=True, default=lambda: User.generate_friend_code())
+    friend_code: so.Mapped[str] = so.mapped_column(sa.String(6), index=True, unique=True, default=lambda context: User.allocate_friend_codes(1, context.connection)[0])
     friends: so.WriteOnlyMapped[List['User']] = so.relationship(
         'User', secondary='friendship',
         primaryjoin=id == friendship.c.user_id,
@@ -39,26 +60,142 @@ class User(UserMixin, db.Model):
         backref='friend_of'
     )
     is_public: so.Mapped[bool] = so.mapped_column(sa.Boolean, default=False)
+    # Bumped whenever anything shown on this user's feed, profile or friends pages changes; see app/etags.py
+    page_version: so.Mapped[int] = so.mapped_column(sa.Integer, default=1)
 
     def __repr__(self):
         return f'<User: {self.username}>'
 
+    CACHED_FIELDS = ('id', 'username', 'email', 'weight_unit', 'date_display', 'friend_code', 'is_public')
+
+    def cache_data(self):
+        return {field: getattr(self, field) for field in self.CACHED_FIELDS}
+
+    @staticmethod
+    def invalidate_cache(user_id):
+        user_cache.delete(('user', user_id))
+
+    def live(self):
+        return self
+
+    def get_exercises(self):
+        # Without progressions: cached cards don't need them, see Exercise.load_progressions
+        query = sa.select(Exercise).where(Exercise.user_id == self.id, Exercise.deleting.is_(False))
+        return db.session.scalars(query).all()
+
+    def feed(self, before=None, limit=10):
+        if current_app.config['FEED_FANOUT']:
+            return self.timeline(before=before, limit=limit)
+        friend_ids = sa.select(friendship.c.friend_id).where(friendship.c.user_id == self.id)
+        query = (
+            sa.select(Progression)
+            .join(Progression.exercise)
+            .where(sa.or_(Exercise.user_id == self.id, Exercise.user_id.in_(friend_ids)))
+            .where(Exercise.deleting.is_(False))
+            .options(so.contains_eager(Progression.exercise).joinedload(Exercise.author))
+            .order_by(Progression.date.desc(), Progression.id.desc())
+            .limit(limit)
+        )
+        if before is not None:
+            # Keyset pagination: continue strictly after the (date, id) of the last progression shown
+            before_date = sa.select(Progression.date).where(Progression.id == before).scalar_subquery()
+            query = query.where(sa.or_(
+                Progression.date < before_date,
+                sa.and_(Progression.date == before_date, Progression.id < before)
+            ))
+        return db.session.scalars(query).all()
+
+    def timeline(self, before=None, limit=10):
+        query = (
+            sa.select(Progression)
+            .join(TimelineEntry, TimelineEntry.progression_id == Progression.id)
+            .join(Progression.exercise)
+            .where(TimelineEntry.user_id == self.id, Exercise.deleting.is_(False))
+            .options(so.contains_eager(Progression.exercise).joinedload(Exercise.author))
+            .order_by(TimelineEntry.date.desc(), TimelineEntry.progression_id.desc())
+            .limit(limit)
+        )
+        if before is not None:
+            before_date = (
+                sa.select(TimelineEntry.date)
+                .where(TimelineEntry.user_id == self.id)
+                .where(TimelineEntry.progression_id == before)
+                .scalar_subquery()
+            )
+            query = query.where(sa.or_(
+                TimelineEntry.date < before_date,
+                sa.and_(TimelineEntry.date == before_date, TimelineEntry.progression_id < before)
+            ))
+        return db.session.scalars(query).all()
+
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+
+    def password_outdated(self):
+        return password_hasher.outdated(self.password_hash)
+
+    @staticmethod
+    def touch_pages(*user_ids, friends=True):
+        # Friends' feeds and profile views show a user's exercises, name and units, so they change with them
+        condition = User.id.in_(user_ids)
+        if friends:
+            condition = sa.or_(condition, User.id.in_(sa.select(friendship.c.friend_id).where(friendship.c.user_id.in_(user_ids))))
+        db.session.execute(
+            sa.update(User).where(condition).values(page_version=User.page_version + 1),
+            execution_options={'synchronize_session': False}
+        )
 
     def avatar(self, size):
         digest = md5(self.email.lower().encode('utf-8')).hexdigest()
         return f'https://www.gravatar.com/avatar/{digest}?d=identicon&s={size}'
 
     @staticmethod
-    def generate_friend_code():
-        while True:
-            code = secrets.token_hex(3).upper()[:6]
-            if not db.session.scalar(sa.select(User).where(User.friend_code == code)):
-                return code
+    def allocate_friend_codes(count, connection=None):
+        # A single UPDATE claims a block of the sequence, so concurrent claims serialize on the row instead of
+        # racing on the unique index. The claim commits or rolls back with the caller's transaction.
+        connection = connection or db.session.connection()
+        codes = []
+        while len(codes) < count:
+            claim = count - len(codes)
+            row = connection.execute(
+                sa.update(friend_code_sequence)
+                .where(friend_code_sequence.c.id == 1)
+                .values(next_index=friend_code_sequence.c.next_index + claim)
+                .returning(friend_code_sequence.c.next_index, friend_code_sequence.c.key)
+            ).first()
+            if row is None:
+                connection.execute(sa.insert(friend_code_sequence).values(id=1, next_index=0, key=secrets.token_hex(16)))
+                continue
+            codes.extend(friend_codes.codes_for(bytes.fromhex(row.key), row.next_index - claim, claim))
+        return codes
+
+
+class CachedUser(UserMixin):
+    # Detached, read-only stand-in for User returned by load_user when the user cache is enabled.
+    # Views that modify the user or its relationships must call live() to get a session-bound User.
+
+    def __init__(self, data):
+        self.__dict__.update(data)
+
+    def __eq__(self, other):
+        return isinstance(other, (User, CachedUser)) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f'<CachedUser: {self.username}>'
+
+    def live(self):
+        return db.session.get(User, self.id)
+
+    avatar = User.avatar
+    get_exercises = User.get_exercises
+    feed = User.feed
+    timeline = User.timeline
 
 
 class FriendRequest(db.Model):
@@ -76,25 +213,164 @@ class FriendRequest(db.Model):
         return f'<FriendRequest from {self.sender.username} to {self.receiver.username}, status: {self.status}>'
 
 
+class CatalogExercise(db.Model):
+    __tablename__ = 'catalog_exercises'
+
+    # Canonical exercise that users' free-text exercise names resolve to through ExerciseAlias
+    id: so.Mapped[int] = so.mapped_column(primary_key=True)
+    name: so.Mapped[str] = so.mapped_column(sa.String(100))
+    # Loaded by `flask sync-catalog`; entries created from users' own names are never searchable by others
+    curated: so.Mapped[bool] = so.mapped_column(sa.Boolean, default=False)
+
+    aliases: so.WriteOnlyMapped['ExerciseAlias'] = so.relationship('ExerciseAlias', back_populates='catalog', passive_deletes=True)
+
+    @staticmethod
+    def normalize(name):
+        return ' '.join(''.join(c if c.isalnum() else ' ' for c in name.casefold()).split())
+
+    def __repr__(self):
+        return f'<CatalogExercise: {self.name}>'
+
+
+class ExerciseAlias(db.Model):
+    __tablename__ = 'exercise_aliases'
+
+    id: so.Mapped[int] = so.mapped_column(primary_key=True)
+    alias: so.Mapped[str] = so.mapped_column(sa.String(100), unique=True)
+    catalog_id: so.Mapped[int] = so.mapped_column(sa.Integer, sa.ForeignKey(CatalogExercise.id, ondelete='CASCADE'), index=True)
+    catalog: so.Mapped[CatalogExercise] = so.relationship('CatalogExercise', back_populates='aliases')
+
+    def __repr__(self):
+        return f'<ExerciseAlias: {self.alias}>'
+
+
 class Exercise(db.Model):
     __tablename__ = 'exercises'
+    __table_args__ = (
+        sa.Index('ix_exercises_user_id_exercise_key', 'user_id', 'exercise_key'),
+    )
 
     id: so.Mapped[int] = so.mapped_column(primary_key=True)
     exercise_name: so.Mapped[str] = so.mapped_column(sa.String(100))
+    # BestLift.key(exercise_name), always computed in Python so leaderboard writes and lookups agree
+    exercise_key: so.Mapped[str] = so.mapped_column(sa.String(100))
 
     user_id: so.Mapped[int] = so.mapped_column(sa.Integer, sa.ForeignKey(User.id), index=True)
     author: so.Mapped[User] = so.relationship('User', back_populates='exercises')
 
     progressions: so.Mapped[List['Progression']] = so.relationship('Progression', back_populates='exercise', lazy=True, order_by='Progression.id', cascade='all, delete-orphan')
 
+    # Set from exercise_name whenever it is added or renamed, see app/catalog.py
+    catalog_id: so.Mapped[Optional[int]] = so.mapped_column(sa.Integer, sa.ForeignKey(CatalogExercise.id), index=True)
+    catalog: so.Mapped[Optional[CatalogExercise]] = so.relationship('CatalogExercise')
+
+    # Current best set (highest weight x reps), maintained by the progression write methods below
+    best_progression_id: so.Mapped[Optional[int]] = so.mapped_column(sa.Integer)
+    best_volume: so.Mapped[float] = so.mapped_column(sa.Float, default=0)
+    # Bumped on every write so cached renderings of the exercise are never served stale
+    version: so.Mapped[int] = so.mapped_column(sa.Integer, default=1)
+    # Sets moved to archived_progressions by the archive job, see app/archive.py
+    archived_sets: so.Mapped[int] = so.mapped_column(sa.Integer, default=0)
+    # Set when the exercise is queued for deletion; it is hidden until the delete_exercise job removes it
+    deleting: so.Mapped[bool] = so.mapped_column(sa.Boolean, default=False)
+
+    @so.validates('exercise_name')
+    def set_exercise_key(self, _, exercise_name):
+        self.exercise_key = BestLift.key(exercise_name)
+        return exercise_name
+
+    @staticmethod
+    def load_progressions(exercises):
+        # Fills the progressions of several exercises with one SELECT ... IN; each progression's exercise
+        # then resolves from the identity map
+        if not exercises:
+            return
+        grouped = {exercise.id: [] for exercise in exercises}
+        for progression in db.session.scalars(
+            sa.select(Progression).where(Progression.exercise_id.in_(grouped)).order_by(Progression.id)
+        ):
+            grouped[progression.exercise_id].append(progression)
+        for exercise in exercises:
+            so.attributes.set_committed_value(exercise, 'progressions', grouped[exercise.id])
+
+    def cache_key(self, kind, *extra):
+        return (kind, self.id, self.version, self.author.weight_unit, self.author.date_display) + extra
+
     def progression(self):
-        progression_list = []
-        for progression in self.progressions:
-            progression_list.append(f'{progression.weight}{self.author.weight_unit} x {progression.rep} reps ({progression.simplified_date()})')
-        return ' -> '.join(progression_list)
+        key = self.cache_key('progression')
+        rendered = render_cache.get(key)
+        if rendered is None:
+            progression_list = [f'{self.archived_sets} archived sets'] if self.archived_sets else []
+            for progression in self.progressions:
+                progression_list.append(f'{progression.weight}{self.author.weight_unit} x {progression.rep} reps ({progression.simplified_date()})')
+            rendered = ' -> '.join(progression_list)
+            render_cache.set(key, rendered)
+        return rendered
+
+    def touch(self):
+        self.version = (self.version or 0) + 1
+        User.touch_pages(self.user_id)
+
+    def rename(self, exercise_name):
+        old_name, self.exercise_name = self.exercise_name, exercise_name
+        self.touch()
+        db.session.flush()
+        BestLift.refresh(self.user_id, old_name)
+        BestLift.refresh(self.user_id, exercise_name)
 
     def get_max(self):
-        return max(self.progressions, key=lambda x: x.weight * x.rep).id
+        return self.best_progression_id
+
+    def refresh_max(self):
+        best = db.session.execute(
+            sa.select(Progression.id, Progression.volume)
+            .where(Progression.exercise_id == self.id)
+            .order_by(Progression.volume.desc(), Progression.id)
+            .limit(1)
+        ).first()
+        archived_volume = (ArchivedProgression.weight * ArchivedProgression.rep).label('volume')
+        archived = db.session.execute(
+            sa.select(ArchivedProgression.id, archived_volume)
+            .where(ArchivedProgression.exercise_id == self.id)
+            .order_by(archived_volume.desc(), ArchivedProgression.id)
+            .limit(1)
+        ).first()
+        # The best set is kept hot, so when it is lowered or deleted an older archived set may be the record again
+        if archived and (best is None or archived.volume > best.volume):
+            ArchivedProgression.restore(archived.id, self)
+            best = archived
+        self.best_progression_id, self.best_volume = best if best else (None, 0)
+
+    def add_progression(self, weight, rep, date=None):
+        progression = Progression(weight=weight, rep=rep, date=date or datetime.now(timezone.utc), exercise_id=self.id)
+        db.session.add(progression)
+        db.session.flush()
+        if self.best_progression_id is None or progression.volume > self.best_volume:
+            progression.is_record = True
+            self.best_progression_id = progression.id
+            self.best_volume = progression.volume
+        TimelineEntry.fan_out(progression, self.user_id)
+        BestLift.consider(self, progression)
+        self.touch()
+        return progression
+
+    def update_progression(self, progression, weight, rep):
+        progression.weight = weight
+        progression.rep = rep
+        db.session.flush()
+        if progression.id == self.best_progression_id or progression.volume > self.best_volume:
+            self.refresh_max()
+        BestLift.refresh(self.user_id, self.exercise_name)
+        self.touch()
+
+    def remove_progression(self, progression):
+        TimelineEntry.remove([progression.id])
+        db.session.delete(progression)
+        db.session.flush()
+        if progression.id == self.best_progression_id:
+            self.refresh_max()
+        BestLift.refresh(self.user_id, self.exercise_name)
+        self.touch()
 
     def __repr__(self):
         return f'<Exercise: {self.exercise_name}, User: {self.author.username}>'
@@ -102,6 +378,11 @@ class Exercise(db.Model):
 
 class Progression(db.Model):
     __tablename__ = 'progressions'
+    __table_args__ = (
+        sa.Index('ix_progressions_exercise_id_date', 'exercise_id', 'date'),
+        # Ids are never handed out again, so a new set cannot collide with an archived one
+        {'sqlite_autoincrement': True}
+    )
 
     id: so.Mapped[int] = so.mapped_column(sa.Integer, primary_key=True)
     rep: so.Mapped[int] = so.mapped_column(sa.Integer)
@@ -109,9 +390,339 @@ class Progression(db.Model):
     date: so.Mapped[datetime] = so.mapped_column(sa.DateTime(timezone=True), default=datetime.now(timezone.utc))
     exercise_id: so.Mapped[int] = so.mapped_column(sa.Integer, sa.ForeignKey(Exercise.id), index=True)
     exercise: so.Mapped[Exercise] = so.relationship('Exercise', back_populates='progressions')
+    # Set when the progression beat the exercise's previous best at the time it was logged
+    is_record: so.Mapped[bool] = so.mapped_column(sa.Boolean, default=False)
+
+    @hybrid_property
+    def volume(self):
+        return self.weight * self.rep
 
     def simplified_date(self):
         return self.date.strftime(self.exercise.author.date_display)
 
     def is_max(self):
-        return self.id == self.exercise.get_max()
+        return self.id == self.exercise.best_progression_id
+
+
+class ArchivedProgression(db.Model):
+    __tablename__ = 'archived_progressions'
+
+    # Cold copy of progressions older than ARCHIVE_AFTER_DAYS, keeping their original ids
+    id: so.Mapped[int] = so.mapped_column(sa.Integer, primary_key=True, autoincrement=False)
+    rep: so.Mapped[int] = so.mapped_column(sa.Integer)
+    weight: so.Mapped[float] = so.mapped_column(sa.Float)
+    date: so.Mapped[datetime] = so.mapped_column(sa.DateTime(timezone=True))
+    exercise_id: so.Mapped[int] = so.mapped_column(sa.Integer, sa.ForeignKey(Exercise.id), index=True)
+    is_record: so.Mapped[bool] = so.mapped_column(sa.Boolean, default=False)
+
+    @classmethod
+    def restore(cls, progression_id, exercise):
+        # Moves the set back into progressions under its old id and takes it out of its week's summary.
+        # Core statements, so the live feed does not announce an old set; sync clients already have it.
+        row = db.session.get(cls, progression_id)
+        db.session.execute(sa.insert(Progression).values(
+            id=row.id, rep=row.rep, weight=row.weight, date=row.date, exercise_id=row.exercise_id, is_record=row.is_record
+        ))
+        summary = db.session.scalar(
+            sa.select(ProgressionSummary)
+            .where(ProgressionSummary.exercise_id == row.exercise_id, ProgressionSummary.week_start <= row.date)
+            .order_by(ProgressionSummary.week_start.desc())
+            .limit(1)
+        )
+        db.session.delete(row)
+        db.session.flush()
+        exercise.archived_sets -= 1
+        if summary is None:
+            return
+        rest = db.session.execute(
+            sa.select(cls.weight, cls.rep)
+            .where(cls.exercise_id == row.exercise_id, cls.date >= summary.week_start)
+            .where(cls.date < summary.week_start + timedelta(days=7))
+        ).all()
+        if not rest:
+            db.session.delete(summary)
+            return
+        summary.set_count = len(rest)
+        summary.volume = sum(weight * rep for weight, rep in rest)
+        summary.best_weight, summary.best_rep = max(rest, key=lambda set_: set_.weight * set_.rep)
+
+
+class ProgressionSummary(db.Model):
+    __tablename__ = 'progression_summaries'
+
+    # One row per exercise and archived week (starting Monday 00:00 UTC), read alongside the recent raw progressions
+    exercise_id: so.Mapped[int] = so.mapped_column(sa.Integer, sa.ForeignKey(Exercise.id), primary_key=True)
+    week_start: so.Mapped[datetime] = so.mapped_column(sa.DateTime(timezone=True), primary_key=True)
+    set_count: so.Mapped[int] = so.mapped_column(sa.Integer)
+    volume: so.Mapped[float] = so.mapped_column(sa.Float)
+    # Highest weight x reps set of the week
+    best_weight: so.Mapped[float] = so.mapped_column(sa.Float)
+    best_rep: so.Mapped[int] = so.mapped_column(sa.Integer)
+
+
+class TimelineEntry(db.Model):
+    __tablename__ = 'timeline'
+    __table_args__ = (
+        sa.Index('ix_timeline_user_id_date', 'user_id', 'date', 'progression_id'),
+    )
+
+    # Materialized feed: one row per (reader, progression), written when FEED_FANOUT is enabled
+    user_id: so.Mapped[int] = so.mapped_column(sa.Integer, sa.ForeignKey(User.id), primary_key=True)
+    progression_id: so.Mapped[int] = so.mapped_column(sa.Integer, sa.ForeignKey(Progression.id), primary_key=True, index=True)
+    date: so.Mapped[datetime] = so.mapped_column(sa.DateTime(timezone=True))
+
+    @staticmethod
+    def enabled():
+        return current_app.config['FEED_FANOUT']
+
+    @staticmethod
+    def _author_progressions(author_id):
+        return (
+            sa.select(Progression.id, Progression.date)
+            .join(Progression.exercise)
+            .where(Exercise.user_id == author_id)
+        )
+
+    @classmethod
+    def fan_out(cls, progression, author_id):
+        if not cls.enabled():
+            return
+        readers = sa.union_all(
+            sa.select(sa.literal(author_id).label('user_id')),
+            sa.select(friendship.c.friend_id).where(friendship.c.user_id == author_id)
+        ).subquery()
+        db.session.execute(sa.insert(cls).from_select(
+            ['user_id', 'progression_id', 'date'],
+            sa.select(readers.c.user_id, sa.literal(progression.id), sa.literal(progression.date, cls.date.type))
+        ))
+
+    @classmethod
+    def fan_out_many(cls, progressions, author_id):
+        if not cls.enabled() or not progressions:
+            return
+        readers = [author_id] + db.session.scalars(
+            sa.select(friendship.c.friend_id).where(friendship.c.user_id == author_id)
+        ).all()
+        db.session.execute(sa.insert(cls), [
+            {'user_id': reader, 'progression_id': progression_id, 'date': date}
+            for reader in readers
+            for progression_id, date in progressions
+        ])
+
+    @classmethod
+    def remove(cls, progression_ids):
+        # Runs even with fan-out disabled so leftover entries never block deleting a progression
+        db.session.execute(sa.delete(cls).where(cls.progression_id.in_(progression_ids)))
+
+    @classmethod
+    def backfill(cls, user_id, friend_id):
+        if not cls.enabled():
+            return
+        for reader, author in ((user_id, friend_id), (friend_id, user_id)):
+            progressions = cls._author_progressions(author).subquery()
+            db.session.execute(sa.insert(cls).from_select(
+                ['user_id', 'progression_id', 'date'],
+                sa.select(sa.literal(reader), progressions.c.id, progressions.c.date)
+            ))
+
+    @classmethod
+    def prune(cls, user_id, friend_id):
+        if not cls.enabled():
+            return
+        for reader, author in ((user_id, friend_id), (friend_id, user_id)):
+            progression_ids = cls._author_progressions(author).with_only_columns(Progression.id)
+            db.session.execute(
+                sa.delete(cls).where(cls.user_id == reader).where(cls.progression_id.in_(progression_ids))
+            )
+
+    @classmethod
+    def rebuild(cls):
+        db.session.execute(sa.delete(cls))
+        own = (
+            sa.select(Exercise.user_id, Progression.id, Progression.date)
+            .join(Progression.exercise)
+        )
+        friends = (
+            sa.select(friendship.c.friend_id, Progression.id, Progression.date)
+            .join(Progression.exercise)
+            .join(friendship, friendship.c.user_id == Exercise.user_id)
+        )
+        db.session.execute(sa.insert(cls).from_select(['user_id', 'progression_id', 'date'], sa.union_all(own, friends)))
+        return db.session.scalar(sa.select(sa.func.count()).select_from(cls))
+
+
+class BestLift(db.Model):
+    __tablename__ = 'best_lifts'
+    __table_args__ = (
+        sa.Index('ix_best_lifts_exercise_key_public_volume', 'exercise_key', 'is_public', 'volume_kg'),
+    )
+
+    # Materialized best set per user and exercise name, so leaderboards are a single indexed read.
+    # Kept current by the Exercise write methods and by preference changes (is_public, weight_unit).
+    user_id: so.Mapped[int] = so.mapped_column(sa.Integer, sa.ForeignKey(User.id), primary_key=True)
+    exercise_key: so.Mapped[str] = so.mapped_column(sa.String(100), primary_key=True)
+    exercise_name: so.Mapped[str] = so.mapped_column(sa.String(100))
+    progression_id: so.Mapped[int] = so.mapped_column(sa.Integer)
+    weight: so.Mapped[float] = so.mapped_column(sa.Float)
+    rep: so.Mapped[int] = so.mapped_column(sa.Integer)
+    date: so.Mapped[datetime] = so.mapped_column(sa.DateTime(timezone=True))
+    volume_kg: so.Mapped[float] = so.mapped_column(sa.Float)
+    is_public: so.Mapped[bool] = so.mapped_column(sa.Boolean, default=False)
+
+    user: so.Mapped[User] = so.relationship('User')
+
+    @staticmethod
+    def key(exercise_name):
+        return exercise_name.strip().lower()
+
+    @classmethod
+    def consider(cls, exercise, progression):
+        author = exercise.author
+        volume_kg = progression.weight * progression.rep * UNIT_FACTORS[(author.weight_unit, 'kgs')]
+        best = db.session.get(cls, (exercise.user_id, cls.key(exercise.exercise_name)))
+        if best is None:
+            best = cls(user_id=exercise.user_id, exercise_key=cls.key(exercise.exercise_name))
+            db.session.add(best)
+        elif volume_kg <= best.volume_kg:
+            return
+        best.exercise_name = exercise.exercise_name
+        best.progression_id = progression.id
+        best.weight = progression.weight
+        best.rep = progression.rep
+        best.date = progression.date
+        best.volume_kg = volume_kg
+        best.is_public = author.is_public
+
+    @classmethod
+    def refresh(cls, user_id, exercise_name):
+        key = cls.key(exercise_name)
+        top = db.session.execute(
+            sa.select(Exercise.exercise_name, Progression.id, Progression.weight, Progression.rep, Progression.date, User.weight_unit, User.is_public)
+            .join(Progression.exercise)
+            .join(Exercise.author)
+            .where(Exercise.user_id == user_id, Exercise.exercise_key == key, Exercise.deleting.is_(False))
+            .order_by(Progression.volume.desc(), Progression.id)
+            .limit(1)
+        ).first()
+        best = db.session.get(cls, (user_id, key))
+        if top is None:
+            if best is not None:
+                db.session.delete(best)
+            return
+        if best is None:
+            best = cls(user_id=user_id, exercise_key=key)
+            db.session.add(best)
+        best.exercise_name, best.progression_id, best.weight, best.rep, best.date = top[:5]
+        best.volume_kg = top.weight * top.rep * UNIT_FACTORS[(top.weight_unit, 'kgs')]
+        best.is_public = top.is_public
+
+    @classmethod
+    def update_owner(cls, user):
+        db.session.execute(
+            sa.update(cls)
+            .where(cls.user_id == user.id)
+            .values(is_public=user.is_public, volume_kg=cls.weight * cls.rep * UNIT_FACTORS[(user.weight_unit, 'kgs')]),
+            execution_options={'synchronize_session': False}
+        )
+
+    @classmethod
+    def rebuild(cls):
+        db.session.execute(sa.delete(cls))
+        ranked = (
+            sa.select(
+                Exercise.user_id, Exercise.exercise_key, Exercise.exercise_name, Progression.id.label('progression_id'),
+                Progression.weight, Progression.rep, Progression.date,
+                (Progression.volume * sa.case((User.weight_unit == 'lbs', UNIT_FACTORS[('lbs', 'kgs')]), else_=1.0)).label('volume_kg'),
+                User.is_public,
+                sa.func.row_number().over(
+                    partition_by=(Exercise.user_id, Exercise.exercise_key),
+                    order_by=(Progression.volume.desc(), Progression.id)
+                ).label('position')
+            )
+            .join(Progression.exercise)
+            .join(Exercise.author)
+            .where(Exercise.deleting.is_(False))
+            .subquery()
+        )
+        columns = ['user_id', 'exercise_key', 'exercise_name', 'progression_id', 'weight', 'rep', 'date', 'volume_kg', 'is_public']
+        db.session.execute(sa.insert(cls).from_select(
+            columns,
+            sa.select(*(ranked.c[column] for column in columns)).where(ranked.c.position == 1)
+        ))
+
+    @classmethod
+    def leaderboard(cls, viewer_id, exercise_name, scope='friends', limit=50):
+        query = (
+            sa.select(cls)
+            .where(cls.exercise_key == cls.key(exercise_name))
+            .options(so.joinedload(cls.user))
+            .order_by(cls.volume_kg.desc(), cls.date)
+            .limit(limit)
+        )
+        if scope == 'public':
+            query = query.where(sa.or_(cls.is_public, cls.user_id == viewer_id))
+        else:
+            friend_ids = sa.select(friendship.c.friend_id).where(friendship.c.user_id == viewer_id)
+            query = query.where(sa.or_(cls.user_id == viewer_id, cls.user_id.in_(friend_ids)))
+        return db.session.scalars(query).all()
+
+    @classmethod
+    def exercise_names(cls, viewer_id):
+        friend_ids = sa.select(friendship.c.friend_id).where(friendship.c.user_id == viewer_id)
+        return db.session.scalars(
+            sa.select(sa.func.min(cls.exercise_name))
+            .where(sa.or_(cls.user_id == viewer_id, cls.user_id.in_(friend_ids)))
+            .group_by(cls.exercise_key)
+            .order_by(cls.exercise_key)
+        ).all()
+
+
+class SyncChange(db.Model):
+    __tablename__ = 'sync_changes'
+    __table_args__ = (
+        sa.Index('ix_sync_changes_user_id_id', 'user_id', 'id'),
+    )
+
+    # Append-only log of the exercises and progressions each user's writes touched; ids are the sync tokens
+    id: so.Mapped[int] = so.mapped_column(primary_key=True)
+    user_id: so.Mapped[int] = so.mapped_column(sa.Integer, sa.ForeignKey(User.id))
+    kind: so.Mapped[str] = so.mapped_column(sa.String(16))
+    object_id: so.Mapped[int] = so.mapped_column(sa.Integer)
+    deleted: so.Mapped[bool] = so.mapped_column(sa.Boolean, default=False)
+
+
+class SyncKey(db.Model):
+    __tablename__ = 'sync_keys'
+
+    # Client-generated idempotency key of every set applied through the sync API
+    user_id: so.Mapped[int] = so.mapped_column(sa.Integer, sa.ForeignKey(User.id), primary_key=True)
+    key: so.Mapped[str] = so.mapped_column(sa.String(64), primary_key=True)
+    progression_id: so.Mapped[int] = so.mapped_column(sa.Integer)
+
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        sa.Index('ix_jobs_status_run_at', 'status', 'run_at'),
+    )
+
+    # Durable queue worked by `flask worker`, see app/jobs.py. dedup_key is only held while the job is
+    # queued, so enqueueing the same work again while it runs schedules a fresh run.
+    id: so.Mapped[int] = so.mapped_column(primary_key=True)
+    name: so.Mapped[str] = so.mapped_column(sa.String(64))
+    payload: so.Mapped[dict] = so.mapped_column(sa.JSON)
+    dedup_key: so.Mapped[Optional[str]] = so.mapped_column(sa.String(128), unique=True)
+    status: so.Mapped[str] = so.mapped_column(sa.String(16), default='queued')
+    attempts: so.Mapped[int] = so.mapped_column(sa.Integer, default=0)
+    max_attempts: so.Mapped[int] = so.mapped_column(sa.Integer, default=3)
+    created_at: so.Mapped[datetime] = so.mapped_column(sa.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    run_at: so.Mapped[datetime] = so.mapped_column(sa.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    started_at: so.Mapped[Optional[datetime]] = so.mapped_column(sa.DateTime(timezone=True))
+    finished_at: so.Mapped[Optional[datetime]] = so.mapped_column(sa.DateTime(timezone=True))
+    # Timings of the latest attempt: time spent waiting past run_at, and running
+    wait_ms: so.Mapped[Optional[float]] = so.mapped_column(sa.Float)
+    duration_ms: so.Mapped[Optional[float]] = so.mapped_column(sa.Float)
+    error: so.Mapped[Optional[str]] = so.mapped_column(sa.Text)
+
+    def __repr__(self):
+        return f'<Job: {self.id} {self.name} {self.status}>'
@@ -0,0 +1,28 @@
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordHasher:
+    # Key derivation runs on a bounded thread pool, so a login burst queues for `workers` cores instead of
+    # occupying every request thread at once. hashlib's scrypt and pbkdf2 release the GIL while deriving,
+    # so the pool threads hash in parallel. The method is a werkzeug method string, e.g. 'scrypt:32768:8:1'
+    # or 'pbkdf2:sha256:600000'; hashes made with any other method are reported as outdated.
+
+    def __init__(self, method, workers):
+        self.method = method
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._prefix = None
+
+    def hash(self, password):
+        return self.executor.submit(generate_password_hash, password, self.method).result()
+
+    def verify(self, pwhash, password):
+        if not pwhash:
+            return False
+        return self.executor.submit(check_password_hash, pwhash, password).result()
+
+    def outdated(self, pwhash):
+        if self._prefix is None:
+            # werkzeug fills in default parameters, so take the canonical prefix from a real hash
+            self._prefix = self.hash('').split('$', 1)[0]
+        return not pwhash or pwhash.split('$', 1)[0] != self._prefix
@@ -0,0 +1,70 @@
+import random
+import sqlite3
+import time
+from contextlib import contextmanager
+from functools import wraps
+import sqlalchemy as sa
+from flask import current_app, g, has_app_context, has_request_context, request, session as cookie_session
+from flask_sqlalchemy.session import Session
+
+
+def replica_keys(config):
+    return [f'replica{i}' for i in range(len(config['DATABASE_REPLICA_URLS']))]
+
+
+class RoutingSession(Session):
+    # Sends reads to the replica that replica_reads picked for the request. Flushes and DML statements go
+    # to the primary, and so does every query after them, so a session always sees its own writes.
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if self._flushing or getattr(clause, 'is_dml', False):
+            self.info['wrote'] = True
+        elif bind is None and not self.info.get('wrote') and has_app_context() and g.get('replica'):
+            return self._db.engines[g.replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@sa.event.listens_for(RoutingSession, 'after_commit')
+def remember_write(session):
+    # Replicas lag behind the primary; keep this user's next requests on the primary until they catch up
+    if session.info.get('wrote') and has_request_context() and current_app.config['DATABASE_REPLICA_URLS']:
+        cookie_session['wrote_at'] = time.time()
+
+
+def replica_reads(view):
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        keys = replica_keys(current_app.config)
+        recent_write = time.time() - cookie_session.get('wrote_at', 0) < current_app.config['REPLICA_READ_YOUR_WRITES']
+        if keys and request.method == 'GET' and not recent_write:
+            g.replica = random.choice(keys)
+        return view(*args, **kwargs)
+    return wrapped
+
+
+@contextmanager
+def primary_reads():
+    # For results kept in shared caches, which must not be filled from a lagging replica
+    replica = g.pop('replica', None) if has_app_context() else None
+    try:
+        yield
+    finally:
+        if replica is not None:
+            g.replica = replica
+
+
+def copy_sqlite_replicas(primary, replicas):
+    # Local stand-in for replication: each replica file becomes a consistent snapshot of the primary
+    source = sqlite3.connect(primary.url.database)
+    try:
+        for replica in replicas:
+            if replica.url.get_backend_name() != 'sqlite':
+                raise ValueError(f'{replica.url!r} is not a SQLite database')
+            replica.dispose()
+            target = sqlite3.connect(replica.url.database)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+    finally:
+        source.close()
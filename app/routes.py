@@ -1,36 +1,77 @@
-from flask import render_template, flash, redirect, url_for, request, abort, jsonify
+from flask import render_template, flash, redirect, url_for, request, abort, jsonify, Response, stream_with_context
+from markupsafe import Markup
 from flask_login import current_user, login_user, logout_user, login_required
+import functools
+import io
+import unicodedata
 import sqlalchemy as sa
-from urllib.parse import urlsplit
-from app import app, db
-from app.forms import LoginForm, RegistrationForm, EditProfileForm, ExerciseForm, EditExerciseForm, AddProgressionForm, PreferencesForm, EditProgressionForm, SendFriendRequestForm, ManageFriendRequestsForm
-from app.models import User, Exercise, friendship, FriendRequest, Progression
-from datetime import datetime, timezone
+from urllib.parse import quote, urlsplit
+from app import app, db, render_cache
+from app.forms import LoginForm, RegistrationForm, EditProfileForm, ExerciseForm, EditExerciseForm, AddProgressionForm, PreferencesForm, EditProgressionForm, SendFriendRequestForm, ManageFriendRequestsForm, ImportForm
+from app.models import User, Exercise, friendship, FriendRequest, Progression, TimelineEntry, BestLift
+from app.friends import friend_graph
+from app.catalog import exercise_catalog
+from app.analytics import FORMULAS, exercise_analytics, user_analytics
+from app.units import UNIT_FACTORS
+from app.importer import import_progressions, format_from_filename
+from app.exporter import EXPORTERS
+from app.jobs import job_queue
+from app.etags import conditional
+from app.replicas import replica_reads
+from app.live import live_feed
+from app.sync import sync
+from datetime import datetime
+
+
+def exercise_cards(exercises):
+    # Progressions are only needed to render cards missing from the cache, and come in one query for all of them
+    keys = [
+        exercise.cache_key('card', exercise.author.username, exercise.author.email, exercise.user_id == current_user.id)
+        for exercise in exercises
+    ]
+    cards = [render_cache.get(key) for key in keys]
+    Exercise.load_progressions([exercise for exercise, card in zip(exercises, cards) if card is None])
+    for i, (exercise, key) in enumerate(zip(exercises, keys)):
+        if cards[i] is None:
+            cards[i] = render_template('_exercise.html', exercise=exercise)
+            render_cache.set(key, cards[i])
+    return [Markup(card) for card in cards]
 
 
 @app.route('/')
 @app.route('/index')
 @login_required
+@replica_reads
+@conditional()
 def index():
-    user_exercises = db.session.scalars(current_user.exercises.select()).all()
-    friend_exercises = db.session.scalars(
-        sa.select(Exercise).where(
-            Exercise.user_id.in_(
-                db.session.scalars(current_user.friends.select().with_only_columns(User.id)).all()
-            )
-        )
-    ).all()
+    before = request.args.get('before', type=int)
+    per_page = app.config['FEED_PER_PAGE']
+    progressions = current_user.feed(before=before, limit=per_page + 1)
 
-    all_exercises = user_exercises + friend_exercises
+    older_url = None
+    if len(progressions) > per_page:
+        progressions = progressions[:per_page]
+        older_url = url_for('index', before=progressions[-1].id)
 
-    all_progressions = []
-    for exercise in all_exercises:
-        for progression in exercise.progressions:
-            all_progressions.append(progression)
+    return render_template('index.html', title='Home Page', exercises=progressions, older_url=older_url)
 
-    all_progressions.sort(key=lambda x: x.date, reverse=True)
 
-    return render_template('index.html', title='Home Page', exercises=all_progressions[:10])
+@app.route('/feed/stream')
+@login_required
+def feed_stream():
+    subscription = live_feed.connect(current_user.id)
+    if subscription is None:
+        return Response('Too many live feed connections', status=503, headers={'Retry-After': str(app.config['LIVE_FEED_HEARTBEAT'])})
+    # The stream never touches the database, so give the connection back before it starts
+    db.session.close()
+    response = Response(
+        live_feed.stream(subscription),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Runs when the server closes the response, even if the body was never iterated (HEAD, early disconnect)
+    response.call_on_close(functools.partial(live_feed.disconnect, current_user.id, subscription))
+    return response
 
 
 @app.route('/login', methods=['GET', 'POST'])
@@ -43,6 +84,9 @@ def login():
         if user is None or not user.check_password(form.password.data):
             flash('Invalid username or password.', 'danger')
             return redirect(url_for('login'))
+        if user.password_outdated():
+            user.set_password(form.password.data)
+            db.session.commit()
         login_user(user, remember=form.remember_me.data)
         next_page = request.args.get('next')
         if not next_page or urlsplit(next_page).netloc != '':
@@ -74,42 +118,41 @@ def register():
 
 @app.route('/profile/<int:user_id>', methods=['GET', 'POST'])
 @login_required
+@replica_reads
+@conditional(lambda user_id: (user_id,))
 def profile(user_id):
     if user_id == current_user.id:
         form = ExerciseForm()
         if form.validate_on_submit():
             new_exercise = Exercise(
                 exercise_name=form.exercise_name.data,
-                user_id=current_user.id,
-                author=current_user
+                user_id=current_user.id
             )
             db.session.add(new_exercise)
-            db.session.commit()
+            db.session.flush()
 
-            new_progression = Progression(rep=form.reps.data, weight=form.weight.data, date=datetime.now(timezone.utc), exercise_id=new_exercise.id)
-
-            db.session.add(new_progression)
+            new_exercise.add_progression(form.weight.data, form.reps.data)
             db.session.commit()
 
             flash('Exercise and progression added successfully!', 'success')
             return redirect(url_for('profile', user_id=user_id))
 
-        query = current_user.exercises.select()
-        exercises = db.session.scalars(query).all()
-        return render_template('profile.html', user=current_user, exercises=exercises, form=form)
+        cards = exercise_cards(current_user.get_exercises())
+        return render_template('profile.html', user=current_user, cards=cards, form=form, friend_count=friend_graph.friend_count(current_user.id))
 
-    existing_friendship = db.session.scalar(
-        sa.select(friendship)
-            .where(friendship.c.user_id == current_user.id)
-            .where(friendship.c.friend_id == user_id)
-    )
+    is_friend = friend_graph.is_friend(current_user.id, user_id)
     user = db.session.scalar(sa.select(User).where(User.id == user_id))
-    if existing_friendship or user.is_public:
-        exercises = db.session.scalars(user.exercises.select()).all()
-        friends = db.session.scalars(user.friends.select()).all()
-        sent_request = db.session.scalar(sa.select(FriendRequest).where(FriendRequest.sender_id == user.id and FriendRequest.receiver_id == current_user.id))
+    if user is None:
+        abort(404)
+    if is_friend or user.is_public:
+        cards = exercise_cards(user.get_exercises())
+        sent_request = db.session.scalar(
+            sa.select(FriendRequest)
+                .where(FriendRequest.sender_id == user.id)
+                .where(FriendRequest.receiver_id == current_user.id)
+        )
 
-        return render_template('friend_profile.html', user=user, exercises=exercises, friends=friends, sent_request=sent_request)
+        return render_template('friend_profile.html', user=user, cards=cards, is_friend=is_friend, friend_count=friend_graph.friend_count(user.id), sent_request=sent_request)
     else:
         return render_template('not_friends.html')
 
@@ -119,8 +162,16 @@ def profile(user_id):
 def edit_profile():
     form = EditProfileForm(current_user.username)
     if form.validate_on_submit():
-        current_user.username = form.username.data
+        user = current_user.live()
+        user.username = form.username.data
+        User.touch_pages(user.id)
+        # Pending requests list the other user by name on the friends page
+        User.touch_pages(*db.session.scalars(sa.union(
+            sa.select(FriendRequest.receiver_id).where(FriendRequest.sender_id == user.id),
+            sa.select(FriendRequest.sender_id).where(FriendRequest.receiver_id == user.id)
+        )), friends=False)
         db.session.commit()
+        User.invalidate_cache(user.id)
         flash('Your changes have been saved.', 'success')
         return redirect(url_for('edit_profile'))
     elif request.method == 'GET':
@@ -132,9 +183,9 @@ def edit_profile():
 @login_required
 def edit_exercise(exercise_id):
     exercise = db.session.scalar(sa.select(Exercise).where(Exercise.id == exercise_id))
-    if exercise is None:
+    if exercise is None or exercise.deleting:
         abort(404)
-    if exercise.author != current_user:
+    if exercise.user_id != current_user.id:
         abort(403)
 
     edit_form = EditExerciseForm()
@@ -147,14 +198,13 @@ def edit_exercise(exercise_id):
     ]
 
     if edit_form.validate_on_submit() and edit_form.submit.data:
-        exercise.exercise_name = edit_form.exercise_name.data
+        exercise.rename(edit_form.exercise_name.data)
         db.session.commit()
         flash('Exercise updated successfully!', 'success')
         return redirect(url_for('profile', user_id=current_user.id))
 
     if add_form.validate_on_submit() and add_form.submit.data:
-        new_progression = Progression(rep=add_form.reps.data, weight=add_form.weight.data, date=datetime.now(timezone.utc), exercise_id=exercise.id)
-        db.session.add(new_progression)
+        exercise.add_progression(add_form.weight.data, add_form.reps.data)
         db.session.commit()
         flash('Progression added successfully!', 'success')
         return redirect(url_for('profile', user_id=current_user.id))
@@ -164,8 +214,7 @@ def edit_exercise(exercise_id):
         progression = db.session.scalar(sa.select(Progression).where(Progression.id == progression_id))
 
         if progression:
-            progression.rep = edit_progression_form.update_reps.data
-            progression.weight = edit_progression_form.update_weight.data
+            exercise.update_progression(progression, edit_progression_form.update_weight.data, edit_progression_form.update_reps.data)
             db.session.commit()
             flash('Progression updated successfully!', 'success')
         else:
@@ -178,7 +227,7 @@ def edit_exercise(exercise_id):
         progression = db.session.scalar(sa.select(Progression).where(Progression.id == progression_id))
 
         if progression:
-            db.session.delete(progression)
+            exercise.remove_progression(progression)
             db.session.commit()
             flash('Progression deleted successfully!', 'success')
         else:
@@ -194,17 +243,54 @@ def edit_exercise(exercise_id):
 @login_required
 def delete_exercise(exercise_id):
     exercise = db.session.scalar(sa.select(Exercise).where(Exercise.id == exercise_id))
-    if exercise is None:
+    if exercise is None or exercise.deleting:
         abort(404)
-    if exercise.author != current_user:
+    if exercise.user_id != current_user.id:
         abort(403)
 
-    db.session.delete(exercise)
+    # Hidden right away; the progressions, timeline entries and archive go in the background
+    exercise.deleting = True
+    BestLift.refresh(current_user.id, exercise.exercise_name)
+    User.touch_pages(current_user.id)
+    job_queue.enqueue('delete_exercise', {'exercise_id': exercise.id}, dedup_key=f'delete_exercise:{exercise.id}')
     db.session.commit()
     flash('Exercise deleted successfully!', 'success')
     return redirect(url_for('profile', user_id=current_user.id))
 
 
+@app.route('/import', methods=['GET', 'POST'])
+@login_required
+def import_history():
+    form = ImportForm()
+    if form.validate_on_submit():
+        upload = form.file.data
+        stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', errors='replace', newline='')
+        result = import_progressions(current_user, stream, format_from_filename(upload.filename), app.config['IMPORT_BATCH_SIZE'])
+        flash(f'Imported {result.rows} progressions into {result.exercises_created} new exercises ({result.skipped} invalid rows skipped).', 'success')
+        return redirect(url_for('profile', user_id=current_user.id))
+    return render_template('import.html', title='Import', form=form)
+
+
+@app.route('/export')
+@login_required
+@replica_reads
+def export_history():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORTERS:
+        abort(404)
+    exporter, mimetype = EXPORTERS[fmt]
+    rows = exporter(current_user.id, current_user.weight_unit, current_user.date_display)
+    response = Response(stream_with_context(rows), mimetype=mimetype)
+    # Quoted like send_file's download_name, with an ASCII fallback for non-ASCII usernames
+    filename = f'{current_user.username}-history.{fmt}'
+    names = {'filename': filename}
+    if not filename.isascii():
+        names['filename'] = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        names['filename*'] = f"UTF-8''{quote(filename, safe='!#$&+^`|~')}"
+    response.headers.set('Content-Disposition', 'attachment', **names)
+    return response
+
+
 @app.route('/preferences', methods=['GET', 'POST'])
 @login_required
 def preferences():
@@ -215,29 +301,50 @@ def preferences():
         form.privacy.data = 'true' if current_user.is_public else 'false'
 
     if form.validate_on_submit():
+        user = current_user.live()
         if form.weight_unit.data:
-            current_user.weight_unit = form.weight_unit.data
+            user.weight_unit = form.weight_unit.data
         if form.display_date.data:
-            current_user.date_display = form.display_date.data
+            user.date_display = form.display_date.data
         if form.privacy.data:
             is_public = form.privacy.data == 'true'
-            current_user.is_public = is_public
+            user.is_public = is_public
+        BestLift.update_owner(user)
+        User.touch_pages(user.id)
         db.session.commit()
+        User.invalidate_cache(user.id)
         flash('Preferences Updated Successfully!', 'success')
         return redirect(url_for('preferences'))
 
     return render_template('preferences.html', title='Preferences', form=form)
 
 
+def owned_progressions():
+    # Ownership is enforced in the WHERE clause, so no per-row exercise/author loads are needed
+    return (
+        sa.select(Progression.id, Progression.exercise_id, Progression.weight, Progression.rep, Progression.date)
+        .join(Progression.exercise)
+        .where(Exercise.user_id == current_user.id, Exercise.deleting.is_(False))
+    )
+
+
+def parse_iso_date(value):
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        abort(400)
+
+
 @app.route('/get_progression_details')
 @login_required
+@replica_reads
 def get_progression_details():
     progression_id = request.args.get('id', type=int)
     if not progression_id:
         return jsonify({'error': 'No ID provided'}), 400
 
-    progression = db.session.scalar(sa.select(Progression).where(Progression.id == progression_id))
-    if not progression or progression.exercise.author != current_user:
+    progression = db.session.execute(owned_progressions().where(Progression.id == progression_id)).first()
+    if not progression:
         return jsonify({'error': 'Invalid ID or unauthorized access'}), 404
 
     return jsonify({
@@ -247,6 +354,111 @@ def get_progression_details():
     })
 
 
+@app.route('/api/progressions')
+@login_required
+@replica_reads
+def api_progressions():
+    max_results = app.config['API_MAX_RESULTS']
+    ids = [int(i) for i in request.args.get('ids', '').split(',') if i.strip().isdigit()]
+    exercise_id = request.args.get('exercise_id', type=int)
+
+    query = owned_progressions().order_by(Progression.id)
+    if ids:
+        if len(ids) > max_results:
+            return jsonify({'error': f'At most {max_results} ids per request'}), 400
+        query = query.where(Progression.id.in_(ids))
+        limit = max_results
+    elif exercise_id:
+        limit = request.args.get('limit', max_results, type=int)
+        if limit < 1:
+            return jsonify({'error': 'limit must be at least 1'}), 400
+        limit = min(limit, max_results)
+        start = parse_iso_date(request.args.get('start'))
+        end = parse_iso_date(request.args.get('end'))
+        after = request.args.get('after', type=int)
+        query = query.where(Progression.exercise_id == exercise_id)
+        if start:
+            query = query.where(Progression.date >= start)
+        if end:
+            query = query.where(Progression.date < end)
+        if after:
+            query = query.where(Progression.id > after)
+    else:
+        return jsonify({'error': 'Provide ids or exercise_id'}), 400
+
+    rows = db.session.execute(query.limit(limit + 1)).all()
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return jsonify({
+        'progressions': [
+            {'id': row.id, 'exercise_id': row.exercise_id, 'weight': row.weight, 'reps': row.rep, 'date': row.date.isoformat()}
+            for row in rows[:limit]
+        ],
+        'next_cursor': next_cursor
+    })
+
+
+def can_view(user):
+    return user.id == current_user.id or user.is_public or friend_graph.is_friend(current_user.id, user.id)
+
+
+def analytics_options():
+    unit = request.args.get('unit', current_user.weight_unit)
+    formula = request.args.get('formula', 'epley')
+    points = request.args.get('points', 200, type=int)
+    if unit not in ('lbs', 'kgs') or formula not in FORMULAS or not 2 <= points <= app.config['ANALYTICS_MAX_POINTS']:
+        return None
+    return {'unit': unit, 'formula': formula, 'max_points': points}
+
+
+@app.route('/api/sync', methods=['POST'])
+@login_required
+def api_sync():
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get('sets', []), list):
+        return jsonify({'error': 'Expected a JSON object with a list of sets'}), 400
+    sets = payload.get('sets', [])
+    if len(sets) > app.config['SYNC_MAX_SETS']:
+        return jsonify({'error': f'At most {app.config["SYNC_MAX_SETS"]} sets per request'}), 400
+    token = payload.get('sync_token')
+    if token is not None and not str(token).isdigit():
+        return jsonify({'error': 'Invalid sync token'}), 400
+    return jsonify(sync(current_user.id, sets, int(token) if token is not None else None))
+
+
+@app.route('/api/catalog')
+@login_required
+@replica_reads
+def api_catalog():
+    results = exercise_catalog.search(request.args.get('q', ''), app.config['AUTOCOMPLETE_RESULTS'])
+    return jsonify({'results': [{'id': id, 'name': name} for id, name in results]})
+
+
+@app.route('/api/exercises/<int:exercise_id>/analytics')
+@login_required
+@replica_reads
+def api_exercise_analytics(exercise_id):
+    exercise = db.session.get(Exercise, exercise_id)
+    if exercise is None or exercise.deleting or not can_view(exercise.author):
+        return jsonify({'error': 'Invalid ID or unauthorized access'}), 404
+    options = analytics_options()
+    if options is None:
+        return jsonify({'error': 'Invalid unit, formula or points'}), 400
+    return jsonify(exercise_analytics(exercise, **options))
+
+
+@app.route('/api/users/<int:user_id>/analytics')
+@login_required
+@replica_reads
+def api_user_analytics(user_id):
+    user = db.session.get(User, user_id)
+    if user is None or not can_view(user):
+        return jsonify({'error': 'Invalid ID or unauthorized access'}), 404
+    options = analytics_options()
+    if options is None:
+        return jsonify({'error': 'Invalid unit, formula or points'}), 400
+    return jsonify(user_analytics(user, **options))
+
+
 @app.route('/send_friend_request', methods=['GET', 'POST'])
 @login_required
 def send_friend_request():
@@ -259,12 +471,7 @@ def send_friend_request():
             if friend.id == current_user.id:
                 flash('You cannot add yourself as a friend.', 'warning')
             else:
-                existing_friendship = db.session.scalar(
-                    sa.select(friendship)
-                        .where(friendship.c.user_id == current_user.id)
-                        .where(friendship.c.friend_id == friend.id)
-                )
-                if existing_friendship:
+                if friend_graph.is_friend(current_user.id, friend.id):
                     flash('You are already friends with this user.', 'warning')
                 else:
                     existing_request = db.session.scalar(
@@ -277,6 +484,7 @@ def send_friend_request():
                         flash('You have already send a friend request to this user.', 'warning')
                     else:
                         db.session.add(FriendRequest(sender_id=current_user.id, receiver_id=friend.id))
+                        friend_graph.requests_changed(current_user.id, friend.id)
                         db.session.commit()
                         flash('Friend request sent successfully!', 'success')
         else:
@@ -288,14 +496,33 @@ def send_friend_request():
 
 @app.route('/friends')
 @login_required
+@replica_reads
+@conditional()
 def friends():
-    query = current_user.friends.select()
+    query = sa.select(User).join(friendship, friendship.c.friend_id == User.id).where(friendship.c.user_id == current_user.id)
     friends = db.session.scalars(query).all()
 
     sent_requests_query = db.session.execute(sa.select(FriendRequest).where(FriendRequest.sender_id == current_user.id)).scalars().all()
     received_requests_query = db.session.execute(sa.select(FriendRequest).where(FriendRequest.receiver_id == current_user.id)).scalars().all()
 
-    return render_template('friends.html', friends=friends, sent_requests=sent_requests_query, received_requests=received_requests_query)
+    suggestions = friend_graph.suggestions(current_user.id, app.config['SUGGESTIONS_PER_PAGE'])
+
+    return render_template('friends.html', friends=friends, sent_requests=sent_requests_query, received_requests=received_requests_query,
+                           suggestions=suggestions, form=SendFriendRequestForm())
+
+
+@app.route('/leaderboard')
+@login_required
+@replica_reads
+def leaderboard():
+    exercise_names = BestLift.exercise_names(current_user.id)
+    exercise_name = request.args.get('exercise') or (exercise_names[0] if exercise_names else None)
+    scope = request.args.get('scope', 'friends')
+    if scope not in ('friends', 'public'):
+        abort(404)
+    entries = BestLift.leaderboard(current_user.id, exercise_name, scope, app.config['LEADERBOARD_SIZE']) if exercise_name else []
+    return render_template('leaderboard.html', title='Leaderboard', entries=entries, exercise_names=exercise_names,
+                           exercise_name=exercise_name, scope=scope, factor=UNIT_FACTORS[('kgs', current_user.weight_unit)])
 
 
 @app.route('/respond_friend_request/<int:request_id>', methods=['POST'])
@@ -307,9 +534,11 @@ def respond_friend_request(request_id):
         abort(403)
 
     action = request.form.get('action')
+    friend_graph.requests_changed(friend_request.sender_id, current_user.id)
     if action == 'accept':
-        db.session.execute(friendship.insert().values(user_id=current_user.id, friend_id=friend_request.sender.id))
-        db.session.execute(friendship.insert().values(user_id=friend_request.sender.id, friend_id=current_user.id))
+        if not friend_graph.is_friend(current_user.id, friend_request.sender_id):
+            friend_graph.add(current_user.id, friend_request.sender_id)
+            TimelineEntry.backfill(current_user.id, friend_request.sender_id)
         db.session.delete(friend_request)
         db.session.commit()
         flash('Friend added successfully!', 'success')
@@ -326,18 +555,14 @@ def respond_friend_request(request_id):
 @app.route('/unfriend/<int:friend_id>', methods=['POST'])
 @login_required
 def unfriend(friend_id):
-    friend = db.session.scalar(sa.select(User).where(User.id == friend_id))
-    query = current_user.friends.select()
-    friends = db.session.scalars(query).all()
-
-    if friend is None or friend not in friends:
+    if not friend_graph.is_friend(current_user.id, friend_id):
         abort(404)
 
-    # Remove the friend from the current user's friends
-    current_user.friends.remove(friend)
+    # Remove both directions of the friendship
+    friend_graph.remove(current_user.id, friend_id)
 
-    # Remove the current user from the friend's friends
-    friend.friends.remove(current_user)
+    # Drop each other's progressions from the materialized timelines
+    TimelineEntry.prune(current_user.id, friend_id)
 
     # Commit the changes
     db.session.commit()
@@ -0,0 +1,106 @@
+import random
+from datetime import datetime, timedelta, timezone
+import sqlalchemy as sa
+from app import db, password_hasher
+from app.models import User, FriendRequest, Exercise, Progression, TimelineEntry, BestLift, friendship
+from app.catalog import exercise_catalog
+
+EXERCISE_NAMES = [
+    'Bench Press', 'Squat', 'Deadlift', 'Overhead Press', 'Barbell Row', 'Pull Up', 'Dip', 'Incline Bench Press',
+    'Front Squat', 'Romanian Deadlift', 'Leg Press', 'Lat Pulldown', 'Bicep Curl', 'Tricep Extension', 'Lunge'
+]
+
+
+def chunks(rows, size):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def insert_returning_ids(model, rows, batch_size):
+    ids = []
+    for batch in chunks(rows, batch_size):
+        ids.extend(db.session.scalars(sa.insert(model).returning(model.id, sort_by_parameter_order=True), batch))
+    return ids
+
+
+def seed(users=100, friends=10, requests=2, exercises=5, progressions=20, password='password', prefix='user',
+         random_seed=None, batch_size=5000):
+    rng = random.Random(random_seed)
+    # Every seeded account shares one hash; hashing per user would dominate the run time
+    password_hash = password_hasher.hash(password)
+
+    codes = User.allocate_friend_codes(users)
+    user_ids = insert_returning_ids(User, [
+        {
+            'username': f'{prefix}{i}', 'email': f'{prefix}{i}@example.com', 'password_hash': password_hash,
+            'friend_code': codes[i], 'weight_unit': 'lbs', 'date_display': '%m/%d/%Y', 'is_public': rng.random() < 0.5
+        }
+        for i in range(users)
+    ], batch_size)
+
+    pairs = set()
+    for user_id in user_ids:
+        for friend_id in rng.sample(user_ids, min(friends, len(user_ids))):
+            if friend_id != user_id:
+                pairs.add((min(user_id, friend_id), max(user_id, friend_id)))
+    for batch in chunks([{'user_id': a, 'friend_id': b} for pair in pairs for a, b in (pair, pair[::-1])], batch_size):
+        db.session.execute(friendship.insert(), batch)
+
+    pending = set()
+    for user_id in user_ids:
+        for sender_id in rng.sample(user_ids, min(requests, len(user_ids))):
+            pair = (min(user_id, sender_id), max(user_id, sender_id))
+            if sender_id != user_id and pair not in pairs and pair not in pending:
+                pending.add(pair)
+                db.session.add(FriendRequest(sender_id=sender_id, receiver_id=user_id))
+    db.session.flush()
+
+    exercise_ids = insert_returning_ids(Exercise, [
+        {'user_id': user_id, 'exercise_name': name, 'exercise_key': BestLift.key(name)}
+        for user_id in user_ids
+        for name in rng.sample(EXERCISE_NAMES, min(exercises, len(EXERCISE_NAMES)))
+    ], batch_size)
+
+    start = datetime.now(timezone.utc) - timedelta(days=progressions * 3)
+    rows = []
+    for exercise_id in exercise_ids:
+        best = None
+        weight = rng.randrange(45, 225, 5)
+        for i in range(progressions):
+            weight = max(0, weight + rng.choice((-10, -5, 0, 5, 5, 10)))
+            reps = rng.randint(1, 12)
+            rows.append({
+                'exercise_id': exercise_id, 'weight': float(weight), 'rep': reps, 'is_record': best is None or weight * reps > best,
+                'date': start + timedelta(days=i * 3, minutes=rng.randrange(1440))
+            })
+            best = weight * reps if best is None else max(best, weight * reps)
+        if len(rows) >= batch_size:
+            db.session.execute(sa.insert(Progression), rows)
+            rows = []
+    if rows:
+        db.session.execute(sa.insert(Progression), rows)
+
+    best = (
+        sa.select(Progression.id, Progression.volume)
+        .where(Progression.exercise_id == Exercise.id)
+        .order_by(Progression.volume.desc(), Progression.id)
+        .limit(1)
+    )
+    db.session.execute(
+        sa.update(Exercise)
+        .where(Exercise.id.in_(exercise_ids))
+        .values(
+            best_progression_id=best.with_only_columns(Progression.id).scalar_subquery(),
+            best_volume=sa.func.coalesce(best.with_only_columns(Progression.volume).scalar_subquery(), 0)
+        ),
+        execution_options={'synchronize_session': False}
+    )
+    if TimelineEntry.enabled():
+        TimelineEntry.rebuild()
+    BestLift.rebuild()
+    exercise_catalog.link_unlinked()
+    db.session.commit()
+    return {
+        'users': len(user_ids), 'friendships': len(pairs), 'friend_requests': len(pending),
+        'exercises': len(exercise_ids), 'progressions': len(exercise_ids) * progressions
+    }
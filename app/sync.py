@@ -0,0 +1,197 @@
+import math
+from datetime import datetime, timedelta, timezone
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import Exercise, Progression, ArchivedProgression, SyncChange, SyncKey
+
+
+class SyncLog:
+    # Appends a SyncChange row for every exercise and progression written through the ORM, so that a client
+    # can ask for what changed after its last token instead of downloading its whole history. Rows are
+    # collected by mapper events and inserted in one statement when the flush completes; Core bulk writes
+    # (the importer) call record() themselves. Progressions removed along with their exercise are covered
+    # by the exercise's own deletion entry. Archiving old progressions is not a deletion and is not logged:
+    # clients keep archived sets, and a full snapshot still includes them.
+
+    def __init__(self):
+        for model, kind in ((Exercise, 'exercise'), (Progression, 'progression')):
+            sa.event.listen(model, 'after_insert', self._recorder(kind, False))
+            sa.event.listen(model, 'after_update', self._recorder(kind, False))
+            sa.event.listen(model, 'after_delete', self._recorder(kind, True))
+        sa.event.listen(db.session, 'after_flush', self._after_flush)
+
+    def _recorder(self, kind, deleted):
+        def listener(mapper, connection, target):
+            gone = deleted
+            if kind == 'exercise' and not deleted:
+                attrs = sa.inspect(target).attrs
+                # Clients drop an exercise as soon as it is marked, before the background job removes its rows
+                gone = target.deleting and attrs.deleting.history.has_changes()
+                if not gone and not attrs.exercise_name.history.has_changes():
+                    # Exercises are also updated by every progression write (version, best set); only a rename is news
+                    return
+            owner = target.user_id if kind == 'exercise' else target.exercise_id
+            so.object_session(target).info.setdefault('sync_changes', []).append((kind, target.id, owner, gone))
+        return listener
+
+    def _after_flush(self, session, flush_context):
+        changes = session.info.pop('sync_changes', None)
+        if not changes:
+            return
+        owners = {object_id: owner for kind, object_id, owner, _ in changes if kind == 'exercise'}
+        deleted_exercises = {object_id for kind, object_id, _, deleted in changes if kind == 'exercise' and deleted}
+        missing = {owner for kind, _, owner, _ in changes if kind == 'progression' and owner not in owners}
+        if missing:
+            owners.update(session.connection().execute(
+                sa.select(Exercise.id, Exercise.user_id).where(Exercise.id.in_(missing))
+            ).all())
+        rows = [
+            {'user_id': owners[owner] if kind == 'progression' else owner, 'kind': kind, 'object_id': object_id, 'deleted': deleted}
+            for kind, object_id, owner, deleted in changes
+            if kind == 'exercise' or (owner not in deleted_exercises and owner in owners)
+        ]
+        if rows:
+            session.connection().execute(sa.insert(SyncChange), rows)
+
+    def record(self, user_id, kind, object_ids):
+        if object_ids:
+            db.session.execute(sa.insert(SyncChange), [
+                {'user_id': user_id, 'kind': kind, 'object_id': object_id, 'deleted': False} for object_id in object_ids
+            ])
+
+
+sync_log = SyncLog()
+
+
+def parse_set(item):
+    # Raises ValueError (or KeyError/TypeError) for anything a client should drop from its queue
+    key = str(item['key'])
+    weight = float(item['weight'])
+    reps = int(item['reps'])
+    date = datetime.fromisoformat(item['timestamp'])
+    date = date if date.tzinfo else date.replace(tzinfo=timezone.utc)
+    exercise_id = item.get('exercise_id')
+    name = str(item.get('exercise') or '').strip()[:100]
+    if not 0 < len(key) <= 64 or not math.isfinite(weight) or weight < 0 or reps < 1 or not (exercise_id or name):
+        raise ValueError('invalid set')
+    if date > datetime.now(timezone.utc) + timedelta(days=1):
+        raise ValueError('set is from the future')
+    return key, weight, reps, date, int(exercise_id) if exercise_id else None, name
+
+
+def apply_sets(user_id, sets):
+    # Returns {key: progression id} for every set now stored, and the keys naming an exercise the user doesn't have
+    applied = dict(db.session.execute(
+        sa.select(SyncKey.key, SyncKey.progression_id)
+        .where(SyncKey.user_id == user_id, SyncKey.key.in_([key for key, *_ in sets]))
+    ).all())
+    pending = [item for item in sets if item[0] not in applied]
+    if not pending:
+        return applied, []
+
+    exercises = db.session.scalars(sa.select(Exercise).where(Exercise.user_id == user_id, Exercise.deleting.is_(False)).order_by(Exercise.id)).all()
+    by_id = {exercise.id: exercise for exercise in exercises}
+    by_name = {}
+    for exercise in exercises:
+        by_name.setdefault(exercise.exercise_name.strip().casefold(), exercise)
+
+    unknown = []
+    # Applied in the order they were performed, so record flags match what the lifter saw at the gym
+    for key, weight, reps, date, exercise_id, name in sorted(pending, key=lambda item: item[3]):
+        if key in applied:
+            continue
+        exercise = by_id.get(exercise_id) or by_name.get(name.casefold())
+        if exercise is None:
+            if not name:
+                unknown.append(key)
+                continue
+            exercise = Exercise(exercise_name=name, user_id=user_id)
+            db.session.add(exercise)
+            db.session.flush()
+            by_id[exercise.id] = by_name[name.casefold()] = exercise
+        progression = exercise.add_progression(weight, reps, date)
+        db.session.add(SyncKey(user_id=user_id, key=key, progression_id=progression.id))
+        applied[key] = progression.id
+    return applied, unknown
+
+
+def changes_since(user_id, token):
+    latest = db.session.scalar(sa.select(sa.func.max(SyncChange.id))) or 0
+    if token is None or token > latest:
+        exercises = db.session.execute(
+            sa.select(Exercise.id, Exercise.exercise_name).where(Exercise.user_id == user_id, Exercise.deleting.is_(False))
+        ).all()
+        archived = (
+            sa.select(ArchivedProgression.id, ArchivedProgression.exercise_id, ArchivedProgression.weight, ArchivedProgression.rep,
+                      ArchivedProgression.date, ArchivedProgression.is_record)
+            .join(Exercise, Exercise.id == ArchivedProgression.exercise_id)
+            .where(Exercise.user_id == user_id, Exercise.deleting.is_(False))
+        )
+        every = (
+            sa.select(Progression.id, Progression.exercise_id, Progression.weight, Progression.rep, Progression.date, Progression.is_record)
+            .join(Progression.exercise)
+            .where(Exercise.user_id == user_id, Exercise.deleting.is_(False))
+            .union_all(archived)
+            .subquery()
+        )
+        progressions = db.session.execute(sa.select(every).order_by(every.c.id)).all()
+        return latest, True, exercises, progressions, [], []
+
+    state = {}
+    for change_id, kind, object_id, deleted in db.session.execute(
+        sa.select(SyncChange.id, SyncChange.kind, SyncChange.object_id, SyncChange.deleted)
+        .where(SyncChange.user_id == user_id, SyncChange.id > token)
+        .order_by(SyncChange.id)
+    ):
+        state[kind, object_id] = deleted
+        token = change_id
+    live = {kind: [object_id for (k, object_id), deleted in state.items() if k == kind and not deleted] for kind in ('exercise', 'progression')}
+    gone = {kind: [object_id for (k, object_id), deleted in state.items() if k == kind and deleted] for kind in ('exercise', 'progression')}
+    exercises = db.session.execute(
+        sa.select(Exercise.id, Exercise.exercise_name)
+        .where(Exercise.user_id == user_id, Exercise.deleting.is_(False), Exercise.id.in_(live['exercise']))
+    ).all() if live['exercise'] else []
+    progressions = db.session.execute(
+        sa.select(Progression.id, Progression.exercise_id, Progression.weight, Progression.rep, Progression.date, Progression.is_record)
+        .join(Progression.exercise)
+        .where(Exercise.user_id == user_id, Exercise.deleting.is_(False), Progression.id.in_(live['progression']))
+        .order_by(Progression.id)
+    ).all() if live['progression'] else []
+    return token, False, exercises, progressions, gone['exercise'], gone['progression']
+
+
+def sync(user_id, items, token):
+    sets, rejected = [], []
+    for item in items:
+        try:
+            sets.append(parse_set(item))
+        except (KeyError, TypeError, ValueError):
+            rejected.append(item.get('key') if isinstance(item, dict) else None)
+
+    # A concurrent retry of the same batch loses the race on the sync_keys primary key; run it again so it
+    # reports the other request's progressions instead of failing
+    for attempt in range(2):
+        try:
+            applied, unknown = apply_sets(user_id, sets)
+            db.session.commit()
+            break
+        except IntegrityError:
+            db.session.rollback()
+            if attempt:
+                raise
+
+    token, full, exercises, progressions, deleted_exercises, deleted_progressions = changes_since(user_id, token)
+    return {
+        'sync_token': str(token),
+        'full': full,
+        'applied': [{'key': key, 'id': progression_id} for key, progression_id in applied.items()],
+        'rejected': rejected + unknown,
+        'exercises': [{'id': id, 'name': name} for id, name in exercises],
+        'progressions': [
+            {'id': id, 'exercise_id': exercise_id, 'weight': weight, 'reps': rep, 'timestamp': date.isoformat(), 'is_record': is_record}
+            for id, exercise_id, weight, rep, date, is_record in progressions
+        ],
+        'deleted': {'exercises': deleted_exercises, 'progressions': deleted_progressions}
+    }
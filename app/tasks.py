@@ -0,0 +1,21 @@
+import sqlalchemy as sa
+from app import db
+from app.archive import remove_archived
+from app.jobs import job_queue
+from app.models import User, Exercise, Progression, TimelineEntry, BestLift
+
+
+@job_queue.task('delete_exercise')
+def delete_exercise(exercise_id):
+    exercise = db.session.get(Exercise, exercise_id)
+    if exercise is None:
+        return
+    # Bulk deletes instead of the ORM cascade, which loads and deletes every progression one by one.
+    # Sync clients learn about the progressions from the exercise's own deletion entry.
+    TimelineEntry.remove(sa.select(Progression.id).where(Progression.exercise_id == exercise.id))
+    remove_archived(exercise.id)
+    db.session.execute(sa.delete(Progression).where(Progression.exercise_id == exercise.id))
+    db.session.delete(exercise)
+    db.session.flush()
+    BestLift.refresh(exercise.user_id, exercise.exercise_name)
+    User.touch_pages(exercise.user_id)
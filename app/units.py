@@ -0,0 +1,8 @@
+KG_PER_LB = 0.45359237
+
+UNIT_FACTORS = {
+    ('lbs', 'lbs'): 1.0,
+    ('kgs', 'kgs'): 1.0,
+    ('lbs', 'kgs'): KG_PER_LB,
+    ('kgs', 'lbs'): 1 / KG_PER_LB
+}
@@ -0,0 +1,111 @@
+"""Endpoint benchmark suite.
+
+Seeds a throwaway SQLite file, drives the main pages through the Flask test client and
+reports latency percentiles, SQL statements per request and peak Python memory per endpoint:
+
+    python benchmarks/endpoints.py --users 500 --friends 50 --progressions 100
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--friends', type=int, default=20, help='friendships created per user')
+    parser.add_argument('--pending', type=int, default=2, help='pending friend requests per user')
+    parser.add_argument('--exercises', type=int, default=8, help='exercises per user')
+    parser.add_argument('--progressions', type=int, default=50, help='progressions per exercise')
+    parser.add_argument('--requests', type=int, default=50, help='timed requests per endpoint')
+    parser.add_argument('--fanout', action='store_true', help='enable the materialized feed timeline')
+    parser.add_argument('--random-seed', type=int, default=1)
+    return parser.parse_args()
+
+
+def setup_environment(args):
+    workdir = tempfile.mkdtemp(prefix='gymlogger-bench-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    os.environ['FEED_FANOUT'] = 'true' if args.fanout else 'false'
+
+
+def percentile(samples, pct):
+    if len(samples) < 2:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method='inclusive')[pct - 1]
+
+
+def main():
+    args = parse_args()
+    setup_environment(args)
+
+    import sqlalchemy as sa
+    from app import app, db
+    from app.models import User, Exercise, Progression, friendship
+    from app.seed import seed
+
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        counts = seed(args.users, args.friends, args.pending, args.exercises, args.progressions, random_seed=args.random_seed)
+        print(f"Seeded {', '.join(f'{n} {name}' for name, n in counts.items())} in {time.perf_counter() - started:.1f}s")
+
+        # Benchmark as the best-connected user, which is the worst case for the feed
+        user_id = db.session.scalar(
+            sa.select(friendship.c.user_id).group_by(friendship.c.user_id).order_by(sa.func.count().desc()).limit(1)
+        )
+        user = db.session.get(User, user_id)
+        friend_id = db.session.scalar(sa.select(friendship.c.friend_id).where(friendship.c.user_id == user_id).limit(1))
+        exercise_id = db.session.scalar(sa.select(Exercise.id).where(Exercise.user_id == user_id).limit(1))
+        progression_id = db.session.scalar(sa.select(Progression.id).where(Progression.exercise_id == exercise_id).limit(1))
+        username = user.username
+        engine = db.engine
+
+    client = app.test_client()
+    response = client.post('/login', data={'username': username, 'password': 'password'})
+    assert response.status_code == 302, 'login failed'
+
+    endpoints = [
+        ('index', '/index'),
+        ('profile', f'/profile/{user_id}'),
+        ('friend profile', f'/profile/{friend_id}'),
+        ('friends', '/friends'),
+        ('edit_exercise', f'/edit_exercise/{exercise_id}'),
+        ('get_progression_details', f'/get_progression_details?id={progression_id}')
+    ]
+
+    statements = []
+    sa.event.listen(engine, 'before_cursor_execute', lambda *a: statements.append(1))
+
+    print(f"{'endpoint':<26}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'peak KB':>10}")
+    for name, url in endpoints:
+        client.get(url)
+        latencies = []
+        statements.clear()
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            response = client.get(url)
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, f'{url} returned {response.status_code}'
+        queries = len(statements) / args.requests
+
+        # Memory is measured on a separate request because tracing skews the latencies
+        tracemalloc.start()
+        client.get(url)
+        peak = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+
+        print(f'{name:<26}{percentile(latencies, 50):>9.2f}{percentile(latencies, 95):>9.2f}'
+              f'{percentile(latencies, 99):>9.2f}{queries:>9.1f}{peak:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
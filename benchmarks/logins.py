@@ -0,0 +1,94 @@
+"""Login throughput benchmark.
+
+Runs concurrent logins through the Flask test client once per password hash method, each in a fresh
+process so PASSWORD_HASH_METHOD and PASSWORD_HASH_WORKERS apply from startup, and reports logins
+per second and latency percentiles:
+
+    python benchmarks/logins.py --methods pbkdf2:sha256:600000,scrypt:32768:8:1 --concurrency 16
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_METHODS = 'pbkdf2:sha256:100000,pbkdf2:sha256:600000,scrypt:16384:8:1,scrypt:32768:8:1'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--methods', default=DEFAULT_METHODS, help='comma separated werkzeug hash methods')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='PASSWORD_HASH_WORKERS')
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads logging in at once')
+    parser.add_argument('--logins', type=int, default=10, help='logins per client thread')
+    parser.add_argument('--run', metavar='METHOD', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def percentile(samples, pct):
+    if len(samples) < 2:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method='inclusive')[pct - 1]
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix='gymlogger-bench-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    os.environ['PASSWORD_HASH_METHOD'] = args.run
+    os.environ['PASSWORD_HASH_WORKERS'] = str(args.workers)
+
+    from app import app, db
+    from app.seed import seed
+
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with app.app_context():
+        db.create_all()
+        seed(users=args.concurrency, friends=0, requests=0, exercises=0, progressions=0, random_seed=1)
+
+    latencies = []
+    lock = threading.Lock()
+
+    def login_loop(i):
+        client = app.test_client()
+        for _ in range(args.logins):
+            start = time.perf_counter()
+            response = client.post('/login', data={'username': f'user{i}', 'password': 'password'})
+            elapsed = (time.perf_counter() - start) * 1000
+            assert response.status_code == 302 and response.location.endswith('/index'), 'login failed'
+            client.get('/logout')
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=login_loop, args=(i,)) for i in range(args.concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    print(f'{args.run:<24}{len(latencies) / seconds:>10.1f}{percentile(latencies, 50):>9.1f}'
+          f'{percentile(latencies, 95):>9.1f}{percentile(latencies, 99):>9.1f}')
+
+
+def main():
+    args = parse_args()
+    if args.run:
+        return run(args)
+    print(f'{args.concurrency} clients x {args.logins} logins, {args.workers} hash workers')
+    print(f"{'method':<24}{'logins/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for method in args.methods.split(','):
+        subprocess.run([
+            sys.executable, os.path.abspath(__file__), '--run', method, '--workers', str(args.workers),
+            '--concurrency', str(args.concurrency), '--logins', str(args.logins)
+        ], check=True)
+
+
+if __name__ == '__main__':
+    main()
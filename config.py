@@ -2,6 +2,102 @@ import os
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 
+# Engine tuning per deployment, selected with the DATABASE_PROFILE environment variable.
+# sqlite_pragmas are applied to every new SQLite connection.
+DATABASE_PROFILES = {
+    'dev': {
+        'engine_options': {},
+        'sqlite_pragmas': {}
+    },
+    'sqlite-prod': {
+        'engine_options': {'pool_pre_ping': True},
+        'sqlite_pragmas': {
+            'journal_mode': 'WAL',
+            'busy_timeout': 5000,
+            'synchronous': 'NORMAL',
+            'mmap_size': 268435456,
+            'foreign_keys': 'ON'
+        }
+    },
+    'server-db': {
+        'engine_options': {
+            'pool_size': int(os.environ.get('DATABASE_POOL_SIZE') or 10),
+            'max_overflow': int(os.environ.get('DATABASE_MAX_OVERFLOW') or 20),
+            'pool_pre_ping': True,
+            'pool_recycle': 1800
+        },
+        'sqlite_pragmas': {}
+    }
+}
+
+
+def database_profile(name):
+    if name not in DATABASE_PROFILES:
+        raise ValueError(f'Unknown DATABASE_PROFILE {name!r}, expected one of {", ".join(DATABASE_PROFILES)}')
+    return DATABASE_PROFILES[name]
+
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY')
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(basedir, 'exercise.db')
+    DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE') or 'dev'
+    SQLALCHEMY_ENGINE_OPTIONS = database_profile(DATABASE_PROFILE)['engine_options']
+    SQLITE_PRAGMAS = database_profile(DATABASE_PROFILE)['sqlite_pragmas']
+    # Comma separated read replica URLs; GET views marked with replica_reads query one of them at random.
+    # `flask copy-replicas` refreshes SQLite replicas from the primary to try this out locally.
+    DATABASE_REPLICA_URLS = [url.strip() for url in (os.environ.get('DATABASE_REPLICA_URLS') or '').split(',') if url.strip()]
+    SQLALCHEMY_BINDS = {f'replica{i}': url for i, url in enumerate(DATABASE_REPLICA_URLS)}
+    # Seconds after a user's last write during which their requests read from the primary
+    REPLICA_READ_YOUR_WRITES = int(os.environ.get('REPLICA_READ_YOUR_WRITES') or 10)
+    # werkzeug hash method for new passwords; older hashes are upgraded on the next successful login
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'scrypt:32768:8:1'
+    # Concurrent key derivations per process; further logins wait for a free worker
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or os.cpu_count() or 1)
+    FEED_PER_PAGE = 10
+    # Write feed entries to every friend's timeline at post time instead of joining on each read
+    FEED_FANOUT = os.environ.get('FEED_FANOUT', 'false').lower() == 'true'
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND') or 'app.cache.LRUCache'
+    RENDER_CACHE_SIZE = int(os.environ.get('RENDER_CACHE_SIZE') or 4096)
+    # Seconds a logged-in user's profile is served from cache by the user loader; 0 disables it. Changes only
+    # invalidate the worker that made them, so CACHE_BACKEND must be shared when running several workers.
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL') or 300)
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE') or 10000)
+    # Friend ids and suggestions per user, invalidated on every friendship change in this worker only; with
+    # several workers and no shared CACHE_BACKEND, counts and suggestions may be stale for up to the TTL
+    FRIEND_GRAPH_CACHE_SIZE = int(os.environ.get('FRIEND_GRAPH_CACHE_SIZE') or 10000)
+    FRIEND_GRAPH_CACHE_TTL = int(os.environ.get('FRIEND_GRAPH_CACHE_TTL') or 600)
+    SUGGESTIONS_PER_PAGE = 10
+    SUGGESTIONS_CACHE_TTL = int(os.environ.get('SUGGESTIONS_CACHE_TTL') or 3600)
+    IMPORT_BATCH_SIZE = 5000
+    API_MAX_RESULTS = 500
+    ANALYTICS_MAX_POINTS = 500
+    LEADERBOARD_SIZE = 50
+    # Seconds an ETag stays valid even if nothing changed, so pages served as 304 never carry
+    # a CSRF token older than this (Flask-WTF tokens expire after an hour by default)
+    ETAG_WINDOW = 1800
+    # Live feed over Server-Sent Events; BROKER_BACKEND must be shared (e.g. Redis backed) when running several workers
+    BROKER_BACKEND = os.environ.get('BROKER_BACKEND') or 'app.broker.LocalBroker'
+    LIVE_FEED_QUEUE_SIZE = 100
+    LIVE_FEED_MAX_CONNECTIONS = int(os.environ.get('LIVE_FEED_MAX_CONNECTIONS') or 1000)
+    LIVE_FEED_MAX_PER_USER = 3
+    LIVE_FEED_HEARTBEAT = 25
+    LIVE_FEED_MAX_AGE = 600
+    SYNC_MAX_SETS = 500
+    # Progressions older than this many days are rolled up into weekly summaries by `flask archive-progressions`
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS') or 365)
+    # Background jobs, run by `flask worker`; JOBS_INLINE runs them inside the request instead (no worker needed)
+    JOBS_INLINE = os.environ.get('JOBS_INLINE', 'false').lower() == 'true'
+    WORKER_THREADS = int(os.environ.get('WORKER_THREADS') or 4)
+    JOB_POLL_INTERVAL = 1
+    # Seconds before a running job is assumed lost with its worker and run again
+    JOB_TIMEOUT = int(os.environ.get('JOB_TIMEOUT') or 600)
+    # Base delay in seconds before retrying a failed job, doubled on every further attempt
+    JOB_RETRY_DELAY = 30
+    AUTOCOMPLETE_RESULTS = 10
+    # Request instrumentation: log requests slower than SLOW_REQUEST_MS (0 disables) with their SQL statements
+    SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS') or 0)
+    SERVER_TIMING_HEADER = os.environ.get('SERVER_TIMING_HEADER', 'false').lower() == 'true'
+    # Bearer token that scrapers of /metrics must send; the endpoint answers 403 while it is unset. The
+    # histograms are kept per process, so only scrape a single-process deployment (e.g. one gunicorn
+    # worker with threads): with several workers each scrape reads whichever one answers and rates break.
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
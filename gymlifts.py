@@ -1,9 +1,126 @@
+import click
 import sqlalchemy as sa
 import sqlalchemy.orm as so
 from app import app, db
-from app.models import User, Exercise
+from app.models import User, Exercise, TimelineEntry
+from app.importer import import_progressions, format_from_filename, rows_per_second
+from app.seed import seed
+from app.catalog import exercise_catalog, STARTER_CATALOG
+from app.archive import archive_progressions
+from app.replicas import replica_keys, copy_sqlite_replicas
+from app.jobs import job_queue
 
 
 @app.shell_context_processor
 def make_shell_context():
     return {'sa': sa, 'so': so, 'db': db, 'User': User, 'Exercise': Exercise}
+
+
+@app.cli.command('import-progressions')
+@click.argument('username')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+@click.option('--batch-size', default=5000, show_default=True)
+def import_progressions_command(username, path, fmt, batch_size):
+    """Bulk import a user's progressions from a CSV or NDJSON file."""
+    user = db.session.scalar(sa.select(User).where(User.username == username))
+    if user is None:
+        raise click.ClickException(f'No user named {username}.')
+
+    def report(rows, seconds):
+        click.echo(f'{rows} rows ({rows / seconds:.0f} rows/s)')
+
+    with open(path, encoding='utf-8-sig', errors='replace', newline='') as stream:
+        result = import_progressions(user, stream, fmt or format_from_filename(path), batch_size, on_batch=report)
+    click.echo(
+        f'Imported {result.rows} progressions into {result.exercises_created} new exercises '
+        f'in {result.seconds:.1f}s ({rows_per_second(result):.0f} rows/s); {result.skipped} invalid rows skipped.'
+    )
+
+
+@app.cli.command('seed')
+@click.option('--users', default=100, show_default=True)
+@click.option('--friends', default=10, show_default=True, help='Random friendships created per user.')
+@click.option('--requests', default=2, show_default=True, help='Pending friend requests received per user.')
+@click.option('--exercises', default=5, show_default=True, help='Exercises per user.')
+@click.option('--progressions', default=20, show_default=True, help='Progressions per exercise.')
+@click.option('--password', default='password', show_default=True)
+@click.option('--prefix', default='user', show_default=True, help='Username prefix.')
+@click.option('--random-seed', type=int)
+def seed_command(users, friends, requests, exercises, progressions, password, prefix, random_seed):
+    """Generate a synthetic dataset for development and benchmarks."""
+    counts = seed(users, friends, requests, exercises, progressions, password, prefix, random_seed)
+    click.echo(', '.join(f'{count} {name}' for name, count in counts.items()))
+
+
+@app.cli.command('rebuild-timeline')
+def rebuild_timeline():
+    """Rebuild the materialized feed timeline (run after enabling FEED_FANOUT)."""
+    count = TimelineEntry.rebuild()
+    db.session.commit()
+    click.echo(f'Wrote {count} timeline entries.')
+
+
+@app.cli.command('sync-catalog')
+def sync_catalog():
+    """Load the starter exercise catalog and link exercises that have no catalog entry."""
+    exercise_catalog.load(STARTER_CATALOG)
+    count = exercise_catalog.link_unlinked()
+    db.session.commit()
+    click.echo(f'Loaded {len(STARTER_CATALOG)} catalog entries and linked {count} exercise names.')
+
+
+@app.cli.command('archive-progressions')
+@click.option('--days', type=int, help='Defaults to ARCHIVE_AFTER_DAYS.')
+@click.option('--batch-size', default=100, show_default=True, help='Exercises archived per transaction.')
+def archive_progressions_command(days, batch_size):
+    """Roll progressions older than the horizon up into weekly summaries and move them to the archive."""
+    result = archive_progressions(days if days is not None else app.config['ARCHIVE_AFTER_DAYS'], batch_size)
+    click.echo(f'Archived {result.progressions} progressions of {result.exercises} exercises into {result.weeks} weekly summaries.')
+
+
+@app.cli.command('copy-replicas')
+def copy_replicas():
+    """Overwrite the SQLite read replicas with a snapshot of the primary database."""
+    keys = replica_keys(app.config)
+    if not keys:
+        raise click.ClickException('No DATABASE_REPLICA_URLS configured.')
+    try:
+        copy_sqlite_replicas(db.engine, [db.engines[key] for key in keys])
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Copied the primary database to {len(keys)} replicas.')
+
+
+@app.cli.command('worker')
+@click.option('--threads', type=int, help='Defaults to WORKER_THREADS.')
+@click.option('--burst', is_flag=True, help='Exit once no job is due instead of waiting for more.')
+def worker(threads, burst):
+    """Run queued background jobs until interrupted."""
+    threads = threads or app.config['WORKER_THREADS']
+
+    def report(result):
+        click.echo(
+            f'{result.name} #{result.id} {result.status} in {result.duration_ms:.1f}ms '
+            f'(attempt {result.attempts}, waited {result.wait_ms:.1f}ms)'
+        )
+
+    click.echo(f'Worker running {threads} threads.')
+    job_queue.work(app, threads, app.config['JOB_POLL_INTERVAL'], burst, on_result=report)
+
+
+@app.cli.command('job-stats')
+def job_stats():
+    """Show job counts and timings per job name and status."""
+    click.echo(f"{'job':<24}{'status':<10}{'count':>8}{'avg wait ms':>14}{'avg run ms':>14}{'max run ms':>14}")
+    for name, status, count, *timings in job_queue.stats():
+        click.echo(f'{name:<24}{status:<10}{count:>8}' + ''.join(f'{value or 0:>14.1f}' for value in timings))
+
+
+@app.cli.command('purge-jobs')
+@click.option('--days', default=7, show_default=True, help='Keep finished jobs this many days.')
+def purge_jobs(days):
+    """Delete finished and failed jobs older than the given number of days."""
+    count = job_queue.purge(days)
+    db.session.commit()
+    click.echo(f'Deleted {count} jobs.')
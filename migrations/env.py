@@ -90,13 +90,29 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
+    # the catalog_search FTS5 table and its shadow tables are managed by hand
+    # in their migration, so autogenerate must not try to drop them
+    def include_object(object, name, type_, reflected, compare_to):
+        return not (type_ == 'table' and name.startswith('catalog_search'))
+
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    if conf_args.get("include_object") is None:
+        conf_args["include_object"] = include_object
 
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        # batch_alter_table rebuilds SQLite tables with DROP TABLE, which fails while other tables
+        # reference them if the sqlite-prod profile turned on foreign key enforcement. The pragma
+        # only takes effect outside a transaction, and the data is checked once all migrations ran.
+        sqlite = connection.dialect.name == 'sqlite'
+        if sqlite:
+            foreign_keys = connection.exec_driver_sql('PRAGMA foreign_keys').scalar()
+            connection.exec_driver_sql('PRAGMA foreign_keys = OFF')
+            connection.commit()
+
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
@@ -106,6 +122,13 @@ def run_migrations_online():
         with context.begin_transaction():
             context.run_migrations()
 
+        if sqlite:
+            violations = connection.exec_driver_sql('PRAGMA foreign_key_check').fetchall()
+            connection.exec_driver_sql(f'PRAGMA foreign_keys = {foreign_keys}')
+            connection.commit()
+            if violations:
+                raise RuntimeError(f'Foreign key violations after migrating: {violations[:10]}')
+
 
 if context.is_offline_mode():
     run_migrations_offline()
@@ -0,0 +1,39 @@
+"""empty message
+
+Revision ID: a31ec71f6621
+Revises: 999d4ff1edcc
+Create Date: 2026-10-18 18:15:19.853731
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a31ec71f6621'
+down_revision = '999d4ff1edcc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        # Sequences elsewhere never hand out an id twice
+        return
+    # Without AUTOINCREMENT SQLite reuses the highest rowid once it is deleted, which can collide with an
+    # archived progression. Continue numbering after the highest id in either table.
+    with op.batch_alter_table('progressions', recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+        pass
+    op.execute("DELETE FROM sqlite_sequence WHERE name = 'progressions'")
+    op.execute(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'progressions', max("
+        "coalesce((SELECT max(id) FROM progressions), 0), coalesce((SELECT max(id) FROM archived_progressions), 0))"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('progressions', recreate='always'):
+        pass